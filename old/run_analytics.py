@@ -10,8 +10,8 @@ def main():
     out_res = ROOT / "outputs" / "results"
     out_fig = ROOT / "outputs" / "figures"
 
-    daily_no = out_res / "daily_nohedge.csv"
-    daily_h  = out_res / "daily_deltahedged.csv"
+    daily_no = out_res / "daily_nohedge.parquet"
+    daily_h  = out_res / "daily_deltahedged.parquet"
 
     cfg = AnalyticsConfig(periods_per_year=252, rf_annual=0.0, rolling_vol_window=63)
 
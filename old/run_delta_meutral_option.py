@@ -2,9 +2,10 @@
 # -*- coding: utf-8 -*-
 
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
-from src.execution import ExecutionParams, simulate_legging_cost
+from src.execution import ExecutionParams, simulate_legging_cost_batch
 from src.strategy import PricingParams
 
 
@@ -12,35 +13,24 @@ ROOT = Path(__file__).resolve().parents[1]
 RES = ROOT / "outputs" / "results"
 
 
-def _ensure_datetime_col(df: pd.DataFrame) -> pd.DataFrame:
-    if "datetime" not in df.columns:
-        # Si viene como index guardado
-        if "Unnamed: 0" in df.columns:
-            df = df.rename(columns={"Unnamed: 0": "datetime"})
-        else:
-            raise ValueError("No encuentro columna 'datetime'.")
-    df["datetime"] = pd.to_datetime(df["datetime"])
-    return df
-
-
 def main():
-    trades_path = RES / "trades_nohedge.csv"
-    daily_path  = RES / "daily_nohedge.csv"
+    trades_path = RES / "trades_nohedge.parquet"
+    daily_path  = RES / "daily_nohedge.parquet"
 
     if not trades_path.exists():
         raise FileNotFoundError(f"No existe {trades_path}. Ejecuta antes scripts.run_backtest.")
     if not daily_path.exists():
         raise FileNotFoundError(f"No existe {daily_path}. Ejecuta antes scripts.run_backtest.")
 
-    trades = pd.read_csv(trades_path)
-    trades = _ensure_datetime_col(trades)
+    # Parquet conserva los tipos: datetime/expiry ya son datetime64
+    trades = pd.read_parquet(trades_path)
 
-    daily = pd.read_csv(daily_path)
-    daily = _ensure_datetime_col(daily).set_index("datetime").sort_index()
+    # El index datetime se guarda en el Parquet
+    daily = pd.read_parquet(daily_path).sort_index()
 
     # Nos quedamos con aperturas (si tu columna type tiene otro nombre, ajústalo)
     if "type" not in trades.columns:
-        raise ValueError("trades_nohedge.csv debe tener columna 'type' (ej: ROLL_OPEN).")
+        raise ValueError("trades_nohedge.parquet debe tener columna 'type' (ej: ROLL_OPEN).")
 
     opens = trades[trades["type"] == "ROLL_OPEN"].copy()
     if opens.empty:
@@ -61,45 +51,47 @@ def main():
 
     prc = PricingParams(days_in_year=365)
 
-    rows = []
-    for _, r in opens.iterrows():
-        t = pd.Timestamp(r["datetime"])
-
-        # Columnas esperadas en trades: K y expiry
-        if "K" not in r.index or "expiry" not in r.index:
-            raise ValueError("En trades_nohedge.csv espero columnas 'K' y 'expiry' en las filas ROLL_OPEN.")
-
-        K = float(r["K"])
-        expiry = pd.Timestamp(r["expiry"])
-
-        # Columnas esperadas en daily: S y sigma (si no, ajusta a tu naming real)
-        if "S" not in daily.columns:
-            raise ValueError("En daily_nohedge.csv espero columna 'S' (precio subyacente).")
-        if "sigma" not in daily.columns:
-            raise ValueError("En daily_nohedge.csv espero columna 'sigma' (vol usada).")
-
-        S = float(daily.loc[t, "S"])
-        sigma = float(daily.loc[t, "sigma"])
-
-        # Tiempo a vencimiento en años
-        T = max((expiry - t).days / prc.days_in_year, 1e-9)
-
-        out = simulate_legging_cost(
-            S=S, K=K, T=T, r=0.0, sigma=sigma, q=0.0,
-            params=params,
-            order="C_then_P",
-        )
-
-        rows.append({
-            "datetime": t,
-            "K": K,
-            "S": S,
-            "sigma": sigma,
-            "T_years": T,
-            **out
-        })
-
-    df = pd.DataFrame(rows).sort_values("datetime")
+    # Columnas esperadas en trades: K y expiry
+    if "K" not in opens.columns or "expiry" not in opens.columns:
+        raise ValueError("En trades_nohedge.parquet espero columnas 'K' y 'expiry' en las filas ROLL_OPEN.")
+
+    # Columnas esperadas en daily: S y sigma (si no, ajusta a tu naming real)
+    if "S" not in daily.columns:
+        raise ValueError("En daily_nohedge.parquet espero columna 'S' (precio subyacente).")
+    if "sigma" not in daily.columns:
+        raise ValueError("En daily_nohedge.parquet espero columna 'sigma' (vol usada).")
+
+    # S/sigma de cada apertura por posición: get_indexer una vez sobre el índice diario
+    # y take sobre los arrays (sin merge ni lookups por etiqueta)
+    # (S/sigma NaN de una fila existente se pasan tal cual al batch; solo falta de fila es error)
+    pos = daily.index.get_indexer(opens["datetime"])
+    missing = pos < 0
+    if missing.any():
+        raise KeyError(f"Fechas ROLL_OPEN sin fila en daily_nohedge: {opens['datetime'][missing].tolist()}")
+    S = daily["S"].to_numpy(dtype=float)[pos]
+    sigma = daily["sigma"].to_numpy(dtype=float)[pos]
+    K = opens["K"].to_numpy(dtype=float)
+
+    # Tiempo a vencimiento en años
+    # expiry/datetime ya vienen como datetime64 del Parquet: una resta vectorizada, sin parseo
+    T = np.maximum((opens["expiry"] - opens["datetime"]).dt.days.to_numpy() / prc.days_in_year, 1e-9)
+
+    # Un único batch Monte-Carlo para todas las aperturas
+    out = simulate_legging_cost_batch(
+        S=S, K=K, T=T, sigma=sigma,
+        params=params,
+        r=0.0, q=0.0,
+        order="C_then_P",
+    )
+
+    df = pd.DataFrame({
+        "datetime": opens["datetime"].to_numpy(),
+        "K": K,
+        "S": S,
+        "sigma": sigma,
+        "T_years": T,
+        **out
+    }).sort_values("datetime")
 
     out_path = RES / "execution_legging_summary.csv"
     df.to_csv(out_path, index=False)
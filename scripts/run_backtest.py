@@ -3,99 +3,178 @@
 
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
 from pathlib import Path
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # sin GUI: solo guardamos PNGs
+import matplotlib.pyplot as plt
 
-from src.ibkr_data import IBKRData, IBKRConfig
-from src.pricing import sigma_proxy_hv_vix
-from src.strategy import simulate_periodic_straddle, StraddleParams, PricingParams, HedgeParams
+from src.pipeline import get_sigma_dataframe
+from src.strategy import simulate_periodic_straddle_multi, StraddleParams, PricingParams, HedgeParams
 from src.analytics import run_analytics, AnalyticsConfig
-from src.execution import ExecutionParams, simulate_legging_cost
+from src.execution import ExecutionParams, simulate_legging_cost_batch, warmup_jit
 from src.backtest import delta_neutral_with_option
 
 
 ROOT = Path(__file__).resolve().parents[1]
 OUT_RES = ROOT / "outputs" / "results"
 OUT_FIG = ROOT / "outputs" / "figures"
+OUT_CACHE = ROOT / "outputs" / "cache"
 OUT_RES.mkdir(parents=True, exist_ok=True)
 OUT_FIG.mkdir(parents=True, exist_ok=True)
 
+# --hedge -> (sufijo de ficheros, etiqueta, HedgeParams)
+HEDGE_CONFIGS = {
+    "none": ("nohedge", "No Hedge", HedgeParams(enabled=False)),
+    "delta": ("deltahedged", "Delta-Hedged", HedgeParams(enabled=True, target_delta=0.0, rebalance_threshold=50.0)),
+}
 
-def _ensure_dt(df: pd.DataFrame) -> pd.DataFrame:
-    if "datetime" not in df.columns and "Unnamed: 0" in df.columns:
-        df = df.rename(columns={"Unnamed: 0": "datetime"})
-    if "datetime" in df.columns:
-        df["datetime"] = pd.to_datetime(df["datetime"])
-    return df
 
+# =========================
+# Manifest (skip si inputs no cambian)
+# =========================
 
-def run_backtests() -> tuple[Path, Path, Path, Path]:
+def _manifest_key(*parts) -> str:
+    h = hashlib.blake2b()
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else repr(p).encode())
+    return h.hexdigest()
+
+
+def _file_stamp(p: Path) -> list:
+    st = p.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _manifest_hit(name: str, key: str):
+    """
+    Devuelve las rutas guardadas si la clave coincide y todos los outputs siguen tal cual
+    se escribieron (mismo mtime y tamaño); si no, None.
+    """
+    path = OUT_CACHE / f"{name}.manifest"
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    paths = [Path(p) for p in manifest.get("paths", [])]
+    stamps = manifest.get("stamps", [])
+    if manifest.get("key") != key or not paths or len(stamps) != len(paths):
+        return None
+    if not all(p.exists() and _file_stamp(p) == st for p, st in zip(paths, stamps)):
+        return None
+    return paths
+
+
+def _manifest_drop(name: str) -> None:
+    # Antes de reescribir outputs: si la ejecución se corta, no queda un manifest válido
+    # apuntando a ficheros nuevos o a medio escribir
+    (OUT_CACHE / f"{name}.manifest").unlink(missing_ok=True)
+
+
+def _manifest_save(name: str, key: str, paths) -> None:
+    OUT_CACHE.mkdir(parents=True, exist_ok=True)
+    paths = [Path(p) for p in paths]
+    manifest = {"key": key, "paths": [str(p) for p in paths], "stamps": [_file_stamp(p) for p in paths]}
+    (OUT_CACHE / f"{name}.manifest").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def _code_mtimes(*modules: str) -> tuple:
+    # Si cambia el código del simulador también hay que recalcular
+    return tuple((ROOT / "src" / m).stat().st_mtime_ns for m in modules)
+
+
+def _aot_mtimes() -> tuple:
+    # Build AOT opcional (src/bs_aot.*.so/.pyd + bs_aot.hash): crearlo, regenerarlo o borrarlo cambia la clave
+    return tuple((p.name, p.stat().st_mtime_ns) for p in sorted((ROOT / "src").glob("bs_aot*")))
+
+
+def run_backtests(hedge: str = "both") -> dict[str, tuple[Path, Path]]:
     """
     Enunciado:
     1) estrategia long straddle periódico SPY
     2) versión delta-hedged con subyacente
+
+    hedge: "none" | "delta" | "both". Devuelve {sufijo: (daily_path, trades_path)}.
     """
     print("\n==============================")
     print("1-2) BACKTEST: No hedge vs Delta-hedged")
     print("==============================")
 
-    cfg = IBKRConfig(host="127.0.0.1", port=7497, client_id=28, use_market_data=False)
-    ibd = IBKRData(cfg)
-
-    try:
-        ibd.connect()
-        spy = ibd.stock("SPY")
-        df_spy = ibd.historical_bars(spy, duration="5 Y", bar_size="1 day")[["datetime", "close"]]
-        df_vix = ibd.historical_vix(duration="5 Y", bar_size="1 day")
-    finally:
-        ibd.disconnect()
-
-    df_sig = sigma_proxy_hv_vix(
-        df_spy=df_spy,
-        df_vix=df_vix,
-        hv_window=20,
-        hv_annualization=252,
-        vix_weight=0.6,
-        sigma_floor=0.05,
-        sigma_cap=2.0,
-    )
-    (OUT_RES / "spy_sigma_proxy_hv_vix.csv").write_text("", encoding="utf-8")  # touch for clarity
-    df_sig.to_csv(OUT_RES / "spy_sigma_proxy_hv_vix.csv", index=False)
+    df_sig = get_sigma_dataframe(duration="5 Y", bar_size="1 day", hv_window=20, vix_weight=0.6)
+    df_sig.to_parquet(OUT_RES / "spy_sigma_proxy_hv_vix.parquet", index=False, compression="zstd")
 
     str_params = StraddleParams(expiry_target_days=30, roll_frequency="M", strike_round=1.0, contracts=1, multiplier=100)
     prc_params = PricingParams(vol_window=20, vol_annualization=252, risk_free_rate=0.0, dividend_yield=0.0, days_in_year=365)
     initial_cash = 100000.0
 
-    # No hedge
-    hedge_off = HedgeParams(enabled=False)
-    daily_no, trades_no = simulate_periodic_straddle(
-        df_sig[["datetime", "close", "sigma_proxy"]].copy(),
-        str_params, prc_params, hedge_off,
-        initial_cash=initial_cash,
-        sigma_col="sigma_proxy",
+    # Todas las configuraciones pedidas sobre una sola valoración del straddle
+    selected = [HEDGE_CONFIGS[h] for h in (("none", "delta") if hedge == "both" else (hedge,))]
+    tags = [tag for tag, _, _ in selected]
+
+    key = _manifest_key(
+        # datetime a ns: misma clave venga df_sig de IBKR o de la caché Parquet
+        pd.util.hash_pandas_object(
+            df_sig.assign(datetime=df_sig["datetime"].astype("datetime64[ns]")), index=False
+        ).to_numpy().tobytes(),
+        asdict(str_params), asdict(prc_params), [asdict(h) for _, _, h in selected],
+        initial_cash, _code_mtimes("strategy.py", "pricing.py", "utils.py", "_bs_aot.py"), _aot_mtimes(),
     )
-    p_daily_no = OUT_RES / "daily_nohedge.csv"
-    p_trades_no = OUT_RES / "trades_nohedge.csv"
-    daily_no.to_csv(p_daily_no)
-    trades_no.to_csv(p_trades_no, index=False)
-
-    # Delta-hedged
-    hedge_on = HedgeParams(enabled=True, target_delta=0.0, rebalance_threshold=50.0)
-    daily_h, trades_h = simulate_periodic_straddle(
-        df_sig[["datetime", "close", "sigma_proxy"]].copy(),
-        str_params, prc_params, hedge_on,
+    cached = _manifest_hit("backtests", key)
+    if cached is not None:
+        print("OK (manifest, sin cambios):", ", ".join(p.name for p in cached))
+        return {tag: (cached[2 * k], cached[2 * k + 1]) for k, tag in enumerate(tags)}
+
+    _manifest_drop("backtests")
+    results = simulate_periodic_straddle_multi(
+        df_sig[["datetime", "close", "sigma_proxy"]],
+        str_params, prc_params, [h for _, _, h in selected],
         initial_cash=initial_cash,
         sigma_col="sigma_proxy",
     )
-    p_daily_h = OUT_RES / "daily_deltahedged.csv"
-    p_trades_h = OUT_RES / "trades_deltahedged.csv"
-    daily_h.to_csv(p_daily_h)
-    trades_h.to_csv(p_trades_h, index=False)
 
-    print("OK:", p_daily_no.name, p_daily_h.name, p_trades_no.name, p_trades_h.name)
-    return p_daily_no, p_daily_h, p_trades_no, p_trades_h
+    # Parquet (zstd): tipos nativos (datetime incluido) y lectura columnar
+    paths = {}
+    for tag, (daily, trades) in zip(tags, results):
+        p_daily = OUT_RES / f"daily_{tag}.parquet"
+        p_trades = OUT_RES / f"trades_{tag}.parquet"
+        daily.to_parquet(p_daily, compression="zstd")
+        trades.to_parquet(p_trades, index=False, compression="zstd")
+        paths[tag] = (p_daily, p_trades)
+
+    _manifest_save("backtests", key, [p for pair in paths.values() for p in pair])
+
+    print("OK:", ", ".join(p.name for pair in paths.values() for p in pair))
+    return paths
+
+
+def plot_equity(fig, ax, daily, title: str, save_path: Path):
+    # Reutiliza la misma figura entre gráficos
+    ax.clear()
+    daily["equity"].plot(ax=ax)
+    ax.set_title(title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Equity")
+    fig.tight_layout()
+    fig.savefig(save_path)
+
+
+def run_equity_plots(paths: dict[str, tuple[Path, Path]]):
+    fig, ax = plt.subplots()
+    labels = {tag: label for tag, label, _ in HEDGE_CONFIGS.values()}
+    for tag, (p_daily, _) in paths.items():
+        save_path = OUT_FIG / f"equity_{tag}.png"
+        plot_equity(fig, ax, pd.read_parquet(p_daily), f"Equity - Long Straddle ({labels[tag]})", save_path)
+        print("Saved:", save_path.name)
+    plt.close(fig)
 
 
 def run_analytics_block(p_daily_no: Path, p_daily_h: Path):
@@ -108,13 +187,29 @@ def run_analytics_block(p_daily_no: Path, p_daily_h: Path):
     print("==============================")
 
     cfg = AnalyticsConfig(periods_per_year=252, rf_annual=0.0, rolling_vol_window=63)
-    _, _, summary = run_analytics(
-        daily_nohedge_path=p_daily_no,
-        daily_hedged_path=p_daily_h,
-        out_results_dir=OUT_RES,
-        out_figures_dir=OUT_FIG,
-        cfg=cfg
+
+    key = _manifest_key(
+        p_daily_no.stat().st_mtime_ns, p_daily_h.stat().st_mtime_ns,
+        asdict(cfg), _code_mtimes("analytics.py"),
     )
+    p_summary = OUT_RES / "summary_metrics.csv"
+    figs = [OUT_FIG / n for n in (
+        "equity_compare.png", "drawdown_compare.png", "rolling_vol_compare.png",
+        "hist_returns_nohedge.png", "hist_returns_deltahedged.png",
+    )]
+    if _manifest_hit("analytics", key) is not None:
+        print("OK (manifest, sin cambios):", p_summary.name)
+        summary = pd.read_csv(p_summary)
+    else:
+        _manifest_drop("analytics")
+        _, _, summary = run_analytics(
+            daily_nohedge_path=p_daily_no,
+            daily_hedged_path=p_daily_h,
+            out_results_dir=OUT_RES,
+            out_figures_dir=OUT_FIG,
+            cfg=cfg
+        )
+        _manifest_save("analytics", key, [p_summary, *figs])
     print("\nSummary (head):")
     print(summary[["strategy", "total_return", "cagr", "ann_vol", "sharpe", "max_drawdown", "calmar", "hit_ratio"]])
     return summary
@@ -129,18 +224,20 @@ def run_execution_legging(p_trades_no: Path, p_daily_no: Path):
     print("4) EXECUTION: combo vs legs (legging risk)")
     print("==============================")
 
-    trades = _ensure_dt(pd.read_csv(p_trades_no))
-    daily = _ensure_dt(pd.read_csv(p_daily_no)).set_index("datetime").sort_index()
+    trades = pd.read_parquet(p_trades_no)
+    daily = pd.read_parquet(p_daily_no).sort_index()
 
     if "type" not in trades.columns:
-        raise ValueError("trades_nohedge.csv debe tener columna 'type' (esperado: ROLL_OPEN).")
+        raise ValueError("trades_nohedge.parquet debe tener columna 'type' (esperado: ROLL_OPEN).")
 
     opens = trades[trades["type"] == "ROLL_OPEN"].copy()
     if opens.empty:
         raise ValueError(f"No hay filas type=ROLL_OPEN. Types disponibles: {trades['type'].unique().tolist()}")
 
     if "S" not in daily.columns or "sigma" not in daily.columns:
-        raise ValueError("daily_nohedge.csv debe tener columnas 'S' y 'sigma' para simular legging.")
+        raise ValueError("daily_nohedge.parquet debe tener columnas 'S' y 'sigma' para simular legging.")
+    if "K" not in opens.columns or "expiry" not in opens.columns:
+        raise ValueError("En trades_nohedge.parquet espero columnas 'K' y 'expiry' en las filas ROLL_OPEN.")
 
     prc = PricingParams(days_in_year=365)
     params = ExecutionParams(
@@ -153,23 +250,23 @@ def run_execution_legging(p_trades_no: Path, p_daily_no: Path):
         multiplier=100,
     )
 
-    rows = []
-    for _, r in opens.iterrows():
-        t = pd.Timestamp(r["datetime"])
-        if "K" not in r.index or "expiry" not in r.index:
-            raise ValueError("En trades_nohedge.csv espero columnas 'K' y 'expiry' en las filas ROLL_OPEN.")
-
-        K = float(r["K"])
-        expiry = pd.Timestamp(r["expiry"])
-
-        S = float(daily.loc[t, "S"])
-        sigma = float(daily.loc[t, "sigma"])
-        T = max((expiry - t).days / prc.days_in_year, 1e-9)
-
-        out = simulate_legging_cost(S=S, K=K, T=T, r=0.0, sigma=sigma, q=0.0, params=params, order="C_then_P")
-        rows.append({"datetime": t, "S": S, "K": K, "sigma": sigma, "T_years": T, **out})
-
-    df = pd.DataFrame(rows).sort_values("datetime")
+    # Todas las aperturas en un único batch Monte-Carlo.
+    # S/sigma de cada apertura por posición: get_indexer una vez sobre el índice diario
+    # y take sobre los arrays (sin merge ni lookups por etiqueta)
+    # (S/sigma NaN de una fila existente se pasan tal cual al batch; solo falta de fila es error)
+    pos = daily.index.get_indexer(opens["datetime"])
+    missing = pos < 0
+    if missing.any():
+        raise KeyError(f"Fechas ROLL_OPEN sin fila en daily_nohedge: {opens['datetime'][missing].tolist()}")
+    S = daily["S"].to_numpy(dtype=float)[pos]
+    sigma = daily["sigma"].to_numpy(dtype=float)[pos]
+    K = opens["K"].to_numpy(dtype=float)
+    # expiry/datetime ya vienen como datetime64 del Parquet: una resta vectorizada, sin parseo
+    T = np.maximum((opens["expiry"] - opens["datetime"]).dt.days.to_numpy() / prc.days_in_year, 1e-9)
+
+    out = simulate_legging_cost_batch(S=S, K=K, T=T, sigma=sigma, params=params, r=0.0, q=0.0, order="C_then_P")
+
+    df = pd.DataFrame({"datetime": opens["datetime"].to_numpy(), "S": S, "K": K, "sigma": sigma, "T_years": T, **out}).sort_values("datetime")
     out_path = OUT_RES / "execution_legging_summary.csv"
     df.to_csv(out_path, index=False)
 
@@ -202,34 +299,33 @@ def run_delta_neutral_option_demo():
         ("Hedge PUT  2% OTM", "P", round(S * 0.98)),
     ]
 
-    rows = []
-    for name, right, K_hedge in scenarios:
-        res = delta_neutral_with_option(
-            S=S,
-            K_straddle=K_atm,
-            K_hedge=K_hedge,
-            T=T,
-            r=r,
-            sigma=sigma,
-            q=q,
-            hedge_right=right,
-            days_in_year=365
-        )
-        rows.append({
-            "scenario": name,
-            "K_straddle": K_atm,
-            "K_hedge": K_hedge,
-            "n_hedge": res.n_hedge,
-            "total_delta": res.total["delta"],
-            "base_gamma": res.base["gamma"],
-            "total_gamma": res.total["gamma"],
-            "base_vega_1pct": res.base["vega_1pct"],
-            "total_vega_1pct": res.total["vega_1pct"],
-            "base_theta_day": res.base["theta_day"],
-            "total_theta_day": res.total["theta_day"],
-        })
-
-    df = pd.DataFrame(rows)
+    # Todos los escenarios en una sola pasada vectorizada
+    names, rights, K_hedge = zip(*scenarios)
+    res = delta_neutral_with_option(
+        S=S,
+        K_straddle=K_atm,
+        K_hedge=np.array(K_hedge),
+        T=T,
+        r=r,
+        sigma=sigma,
+        q=q,
+        hedge_right=np.array(rights),
+        days_in_year=365
+    )
+
+    df = pd.DataFrame({
+        "scenario": names,
+        "K_straddle": K_atm,
+        "K_hedge": K_hedge,
+        "n_hedge": res.n_hedge,
+        "total_delta": res.total["delta"],
+        "base_gamma": res.base["gamma"],
+        "total_gamma": res.total["gamma"],
+        "base_vega_1pct": res.base["vega_1pct"],
+        "total_vega_1pct": res.total["vega_1pct"],
+        "base_theta_day": res.base["theta_day"],
+        "total_theta_day": res.total["theta_day"],
+    })
     out_path = OUT_RES / "delta_neutral_option_summary.csv"
     df.to_csv(out_path, index=False)
 
@@ -241,45 +337,126 @@ def run_delta_neutral_option_demo():
 def write_run_report(summary_df: pd.DataFrame):
     report = OUT_RES / "RUN_REPORT.md"
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    txt = []
-    txt.append(f"# Run report\n\nGenerado: `{now}`\n\n")
-    txt.append("## Outputs (mapeados al enunciado)\n\n")
-    txt.append("### 1) Long straddle periódico (SPY)\n")
-    txt.append("- `outputs/results/daily_nohedge.csv`\n")
-    txt.append("- `outputs/results/trades_nohedge.csv`\n\n")
-    txt.append("### 2) Versión delta-hedged (subyacente)\n")
-    txt.append("- `outputs/results/daily_deltahedged.csv`\n")
-    txt.append("- `outputs/results/trades_deltahedged.csv`\n\n")
-    txt.append("### 3) Análisis P&L (métricas + gráficos)\n")
-    txt.append("- `outputs/results/summary_metrics.csv`\n")
-    txt.append("- `outputs/figures/equity_compare.png`\n")
-    txt.append("- `outputs/figures/drawdown_compare.png`\n")
-    txt.append("- `outputs/figures/rolling_vol_compare.png`\n\n")
-    txt.append("### 4) Ejecución: combo vs patas (legging)\n")
-    txt.append("- `outputs/results/execution_legging_summary.csv`\n\n")
-    txt.append("### 5) Delta-neutral con otra opción (impacto Gamma/Vega/Theta)\n")
-    txt.append("- `outputs/results/delta_neutral_option_summary.csv`\n\n")
-    txt.append("### 6) Reflexión SPX vs SPY\n")
-    txt.append("- `REFLEXION.md`\n\n")
-
-    txt.append("## Métricas clave\n\n")
-    txt.append(summary_df.to_markdown(index=False))
-    txt.append("\n")
-
-    report.write_text("\n".join(txt), encoding="utf-8")
+    # Plantilla única -> un solo write
+    txt = f"""# Run report
+
+Generado: `{now}`
+
+
+## Outputs (mapeados al enunciado)
+
+
+### 1) Long straddle periódico (SPY)
+
+- `outputs/results/daily_nohedge.parquet`
+
+- `outputs/results/trades_nohedge.parquet`
+
+
+### 2) Versión delta-hedged (subyacente)
+
+- `outputs/results/daily_deltahedged.parquet`
+
+- `outputs/results/trades_deltahedged.parquet`
+
+
+### 3) Análisis P&L (métricas + gráficos)
+
+- `outputs/results/summary_metrics.csv`
+
+- `outputs/figures/equity_compare.png`
+
+- `outputs/figures/drawdown_compare.png`
+
+- `outputs/figures/rolling_vol_compare.png`
+
+
+### 4) Ejecución: combo vs patas (legging)
+
+- `outputs/results/execution_legging_summary.csv`
+
+
+### 5) Delta-neutral con otra opción (impacto Gamma/Vega/Theta)
+
+- `outputs/results/delta_neutral_option_summary.csv`
+
+
+### 6) Reflexión SPX vs SPY
+
+- `REFLEXION.md`
+
+
+## Métricas clave
+
+
+{summary_df.to_markdown(index=False)}
+
+"""
+
+    report.write_text(txt, encoding="utf-8")
     print("\n📝 Report:", report)
 
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backtest long straddle SPY + pipeline de análisis.")
+    parser.add_argument("--hedge", choices=["none", "delta", "both"], default="both",
+                        help="configuraciones de hedge a simular (default: both)")
+    parser.add_argument("--plots", action="store_true",
+                        help="guardar la curva de equity de cada estrategia (equity_<hedge>.png)")
+    parser.add_argument("--summary", action=argparse.BooleanOptionalAction, default=True,
+                        help="pasos 3-5 (analytics, legging, delta-neutral) + RUN_REPORT; requiere --hedge both")
+    args = parser.parse_args(argv)
+    if args.summary and args.hedge != "both":
+        parser.error("--summary compara ambas versiones: usa --hedge both o --no-summary")
+    return args
+
+
+def main(args: argparse.Namespace | None = None):
+    args = parse_args() if args is None else args
+
     print("\n==============================")
     print("   PRACTICA 4 - RUN ALL")
     print("==============================")
     print("IMPORTANTE: abre TWS y deja API activa.\n")
 
-    p_daily_no, p_daily_h, p_trades_no, _ = run_backtests()
-    summary = run_analytics_block(p_daily_no, p_daily_h)
-    run_execution_legging(p_trades_no, p_daily_no)
-    run_delta_neutral_option_demo()
+    warmup_jit()
+
+    paths = run_backtests(args.hedge)
+    if args.plots:
+        run_equity_plots(paths)
+    if not args.summary:
+        return
+
+    (p_daily_no, p_trades_no), (p_daily_h, _) = paths["nohedge"], paths["deltahedged"]
+
+    stages = [
+        (run_analytics_block, (p_daily_no, p_daily_h)),
+        (run_execution_legging, (p_trades_no, p_daily_no)),
+        (run_delta_neutral_option_demo, ()),
+    ]
+
+    # 3), 4) y 5) solo leen los outputs de 1-2) y escriben ficheros distintos.
+    # Por defecto van en serie en este mismo proceso: reutilizan imports y JIT ya cargados.
+    # Con "spawn" cada worker arranca un intérprete nuevo y reimporta pandas/matplotlib/numba,
+    # lo que cuesta más que las propias etapas con ~5 años diarios.
+    # RUN_ALL_PARALLEL=1 las lanza en procesos (series mucho más largas / más etapas).
+    if os.environ.get("RUN_ALL_PARALLEL", "0") != "1":
+        summary = [fn(*a) for fn, a in stages][0]
+    else:
+        # "spawn": hacer fork con el pool de hilos de Numba ya arrancado puede bloquear el proceso.
+        # Sin "with": su __exit__ hace shutdown(wait=True) y el error esperaría a las demás etapas.
+        ex = ProcessPoolExecutor(max_workers=len(stages), mp_context=mp.get_context("spawn"))
+        futures = [ex.submit(fn, *a) for fn, a in stages]
+        # El primer fallo se propaga en cuanto ocurre; las etapas que ya estaban corriendo
+        # no se interrumpen (terminan en segundo plano antes de que salga el intérprete).
+        for fut in as_completed(futures):
+            exc = fut.exception()
+            if exc is not None:
+                ex.shutdown(wait=False, cancel_futures=True)
+                raise exc
+        ex.shutdown()
+        summary = futures[0].result()
+
     write_run_report(summary)
 
     print("\n✅ Pipeline completo generado. Revisa outputs/results y outputs/figures.\n")
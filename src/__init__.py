@@ -1 +1,10 @@
+# src/__init__.py
+# -*- coding: utf-8 -*-
 
+import os
+from pathlib import Path
+
+# Caché de compilación de Numba (cache=True) en <repo>/.numba_cache, fijada antes de importar numba:
+# un único sitio compartido por scripts, notebooks y workers de ProcessPool, aunque src/ sea de solo lectura.
+# Se respeta NUMBA_CACHE_DIR si ya viene del entorno.
+os.environ.setdefault("NUMBA_CACHE_DIR", str(Path(__file__).resolve().parents[1] / ".numba_cache"))
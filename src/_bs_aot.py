@@ -0,0 +1,43 @@
+# src/_bs_aot.py
+# -*- coding: utf-8 -*-
+"""
+Build AOT (numba.pycc) de los núcleos Black-Scholes escalares (opción y straddle).
+
+Uso (desde la raíz del repo):
+    python -m src._bs_aot
+
+Genera src/bs_aot.*.so (o .pyd) y src/bs_aot.hash (hash de las fuentes de los kernels).
+Si existe y el hash coincide con el código actual, src.pricing lo importa y
+bs_price_greeks / straddle_greeks evitan el JIT en frío; si no, se usa _bs_kernel (@njit).
+Los kernels batch/paralelos (execution) siguen en JIT con cache=True:
+pycc no soporta parallel=True.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from numba.pycc import CC
+
+from src.pricing import _bs_kernel, _straddle_kernel, aot_source_hash, AOT_HASH_FILE
+
+
+cc = CC("bs_aot")
+cc.output_dir = str(Path(__file__).resolve().parent)
+
+
+@cc.export("bs_kernel", "UniTuple(f8, 5)(f8, f8, f8, f8, f8, b1, f8, f8)")
+def bs_kernel(S, K, T, r, sigma, is_call, q, days_in_year):
+    return _bs_kernel(S, K, T, r, sigma, is_call, q, days_in_year)
+
+
+@cc.export("straddle_kernel", "UniTuple(f8, 7)(f8, f8, f8, f8, f8, f8, f8)")
+def straddle_kernel(S, K, T, r, sigma, q, days_in_year):
+    return _straddle_kernel(S, K, T, r, sigma, q, days_in_year)
+
+
+if __name__ == "__main__":
+    cc.compile()
+    # Se escribe tras compilar: un build a medias no deja un hash válido
+    AOT_HASH_FILE.write_text(aot_source_hash(), encoding="utf-8")
+    print("OK:", cc.output_dir)
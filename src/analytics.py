@@ -3,13 +3,27 @@
 
 from __future__ import annotations
 
+import math
+import os
+import sys
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+import matplotlib
+if "matplotlib.pyplot" not in sys.modules and not os.environ.get("MPLBACKEND"):
+    matplotlib.use("Agg")  # solo se guardan PNGs: sin backend GUI (salvo que ya se haya elegido otro)
 import matplotlib.pyplot as plt
+from numba import njit
+
+try:
+    import bottleneck as bn
+except ImportError:  # opcional: sin bottleneck se usa pandas rolling
+    bn = None
+
+from src.utils import NUMBA_FASTMATH
 
 
 # =========================
@@ -20,23 +34,32 @@ def _to_series(x) -> pd.Series:
         return x
     return pd.Series(x)
 
+def _as_f64(x: pd.Series) -> pd.Series:
+    # Sin copia si ya es float64 (lo normal: daily["equity"] sale float64 del backtest).
+    # No se usa astype(copy=False): deprecado con Copy-on-Write en pandas 3.
+    return x if x.dtype == np.float64 else x.astype(np.float64)
+
 def equity_to_returns(equity: pd.Series) -> pd.Series:
-    equity = equity.astype(float)
+    equity = _as_f64(equity)
     return equity.pct_change().dropna()
 
+def _drawdown_array(equity: pd.Series) -> np.ndarray:
+    eq = equity.to_numpy(dtype=np.float64)
+    # fmax ignora NaN al acumular el pico (igual que cummax); en ese punto dd queda NaN
+    peak = np.fmax.accumulate(eq)
+    return eq / peak - 1.0
+
 def max_drawdown(equity: pd.Series) -> float:
-    eq = equity.astype(float)
-    peak = eq.cummax()
-    dd = eq / peak - 1.0
-    return float(dd.min())
+    dd = _drawdown_array(equity)
+    if np.isnan(dd).all():
+        return float("nan")
+    return float(np.nanmin(dd))
 
 def drawdown_series(equity: pd.Series) -> pd.Series:
-    eq = equity.astype(float)
-    peak = eq.cummax()
-    return (eq / peak - 1.0).astype(float)
+    return pd.Series(_drawdown_array(equity), index=equity.index, name=equity.name)
 
 def annualized_return(equity: pd.Series, periods_per_year: int = 252) -> float:
-    eq = equity.astype(float)
+    eq = _as_f64(equity)
     if len(eq) < 2:
         return float("nan")
     total = eq.iloc[-1] / eq.iloc[0]
@@ -44,13 +67,13 @@ def annualized_return(equity: pd.Series, periods_per_year: int = 252) -> float:
     return float(total ** (periods_per_year / n_periods) - 1.0)
 
 def annualized_vol(returns: pd.Series, periods_per_year: int = 252) -> float:
-    r = returns.astype(float)
+    r = _as_f64(returns)
     if len(r) < 2:
         return float("nan")
-    return float(r.std() * np.sqrt(periods_per_year))
+    return float(r.std() * math.sqrt(periods_per_year))
 
 def sharpe_ratio(returns: pd.Series, rf_annual: float = 0.0, periods_per_year: int = 252) -> float:
-    r = returns.astype(float)
+    r = _as_f64(returns)
     if len(r) < 2:
         return float("nan")
     rf_daily = rf_annual / periods_per_year
@@ -58,10 +81,10 @@ def sharpe_ratio(returns: pd.Series, rf_annual: float = 0.0, periods_per_year: i
     vol = excess.std()
     if vol <= 0:
         return float("nan")
-    return float(excess.mean() / vol * np.sqrt(periods_per_year))
+    return float(excess.mean() / vol * math.sqrt(periods_per_year))
 
 def sortino_ratio(returns: pd.Series, rf_annual: float = 0.0, periods_per_year: int = 252) -> float:
-    r = returns.astype(float)
+    r = _as_f64(returns)
     if len(r) < 2:
         return float("nan")
     rf_daily = rf_annual / periods_per_year
@@ -70,10 +93,10 @@ def sortino_ratio(returns: pd.Series, rf_annual: float = 0.0, periods_per_year:
     dd = downside.std()
     if dd <= 0:
         return float("nan")
-    return float(excess.mean() / dd * np.sqrt(periods_per_year))
+    return float(excess.mean() / dd * math.sqrt(periods_per_year))
 
 def hit_ratio(returns: pd.Series) -> float:
-    r = returns.astype(float)
+    r = _as_f64(returns)
     if len(r) == 0:
         return float("nan")
     return float((r > 0).mean())
@@ -86,8 +109,12 @@ def calmar_ratio(equity: pd.Series, periods_per_year: int = 252) -> float:
     return float(cagr / mdd)
 
 def rolling_vol(returns: pd.Series, window: int = 63, periods_per_year: int = 252) -> pd.Series:
-    r = returns.astype(float)
-    return r.rolling(window).std() * np.sqrt(periods_per_year)
+    r = _as_f64(returns)
+    if bn is None or len(r) < window:
+        return r.rolling(window).std() * math.sqrt(periods_per_year)
+    # Ventana móvil en C (bottleneck); NaN hasta tener `window` observaciones, como pandas
+    mv = bn.move_std(r.to_numpy(), window=window, min_count=window, ddof=1)
+    return pd.Series(mv * math.sqrt(periods_per_year), index=r.index, name=r.name)
 
 
 # =========================
@@ -100,107 +127,230 @@ class AnalyticsConfig:
     rolling_vol_window: int = 63  # ~3 meses
 
 
-def compute_metrics(daily: pd.DataFrame, cfg: AnalyticsConfig) -> Dict[str, Any]:
+@njit(cache=True, fastmath=NUMBA_FASTMATH)
+def _fused_metrics(eq: np.ndarray, rets: np.ndarray, rf_daily: float):
+    """
+    Núcleo Numba de compute_metrics: un solo kernel para momentos de los retornos,
+    downside y drawdown. Devuelve (mean_r, std_r, downside_std, max_dd, hit_rate).
+    """
+    nan = np.nan
+    n = rets.size
+
+    # Pasada 1: medias, hits y downside (excess < 0)
+    sum_r = 0.0
+    hits = 0
+    sum_neg = 0.0
+    n_neg = 0
+    for i in range(n):
+        r = rets[i]
+        sum_r += r
+        if r > 0:
+            hits += 1
+        ex = r - rf_daily
+        if ex < 0:
+            sum_neg += ex
+            n_neg += 1
+    mean_r = sum_r / n if n > 0 else nan
+    mean_neg = sum_neg / n_neg if n_neg > 0 else nan
+
+    # Pasada 2: varianzas (ddof=1) respecto a la media, estable numéricamente
+    ss = 0.0
+    ss_neg = 0.0
+    for i in range(n):
+        d = rets[i] - mean_r
+        ss += d * d
+        ex = rets[i] - rf_daily
+        if ex < 0:
+            dn = ex - mean_neg
+            ss_neg += dn * dn
+    std_r = np.sqrt(ss / (n - 1)) if n >= 2 else nan
+    down_std = np.sqrt(ss_neg / (n_neg - 1)) if n_neg >= 2 else nan
+
+    # Drawdown: peak acumulado ignorando NaN (como cummax)
+    peak = -np.inf
+    min_dd = np.inf
+    for i in range(eq.size):
+        x = eq[i]
+        if np.isnan(x):
+            continue
+        if x > peak:
+            peak = x
+        dd = x / peak - 1.0
+        if dd < min_dd:
+            min_dd = dd
+    max_dd = min_dd if min_dd != np.inf else nan
+
+    hit_rate = hits / n if n > 0 else nan
+    return mean_r, std_r, down_std, max_dd, hit_rate
+
+
+def _metrics_from_arrays(eq: np.ndarray, rets: np.ndarray, cfg: AnalyticsConfig) -> Dict[str, float]:
+    """
+    Mismas métricas que los helpers de arriba, derivadas de una sola llamada a _fused_metrics.
+    """
+    nan = float("nan")
+    ppy = cfg.periods_per_year
+    sqrt_ppy = math.sqrt(ppy)
+    n = rets.size
+    rf_daily = cfg.rf_annual / ppy
+
+    mean_r, std, down_std, mdd, hit = _fused_metrics(
+        np.ascontiguousarray(eq, dtype=np.float64),
+        np.ascontiguousarray(rets, dtype=np.float64),
+        float(rf_daily),
+    )
+
+    cagr = float((eq[-1] / eq[0]) ** (ppy / (eq.size - 1)) - 1.0) if eq.size >= 2 else nan
+    ex_mean = mean_r - rf_daily
+
+    return {
+        "cagr": cagr,
+        "ann_vol": std * sqrt_ppy if n >= 2 else nan,
+        "sharpe": ex_mean / std * sqrt_ppy if n >= 2 and std > 0 else nan,
+        "sortino": ex_mean / down_std * sqrt_ppy if n >= 2 and not down_std <= 0 else nan,
+        "max_drawdown": mdd,
+        "calmar": cagr / abs(mdd) if not abs(mdd) <= 0 else nan,
+        "hit_ratio": hit,
+        "avg_daily_ret": mean_r,
+        "std_daily_ret": std,
+    }
+
+
+def compute_metrics(daily: pd.DataFrame, cfg: AnalyticsConfig, returns: Optional[pd.Series] = None) -> Dict[str, Any]:
+    """
+    `returns` opcional: retornos ya calculados con equity_to_returns (se reutilizan en los plots).
+    """
     if "equity" not in daily.columns:
         raise ValueError("daily debe contener columna 'equity'")
 
-    equity = daily["equity"].astype(float)
-    rets = equity_to_returns(equity)
+    equity = _as_f64(daily["equity"])
+    eq = equity.to_numpy()
+    if returns is None:
+        returns = equity_to_returns(equity)
+    rets = returns.to_numpy()
+    m = _metrics_from_arrays(eq, rets, cfg)
 
     metrics = {
         "start": equity.index.min(),
         "end": equity.index.max(),
-        "start_equity": float(equity.iloc[0]),
-        "end_equity": float(equity.iloc[-1]),
-        "total_return": float(equity.iloc[-1] / equity.iloc[0] - 1.0),
-        "cagr": annualized_return(equity, periods_per_year=cfg.periods_per_year),
-        "ann_vol": annualized_vol(rets, periods_per_year=cfg.periods_per_year),
-        "sharpe": sharpe_ratio(rets, rf_annual=cfg.rf_annual, periods_per_year=cfg.periods_per_year),
-        "sortino": sortino_ratio(rets, rf_annual=cfg.rf_annual, periods_per_year=cfg.periods_per_year),
-        "max_drawdown": max_drawdown(equity),
-        "calmar": calmar_ratio(equity, periods_per_year=cfg.periods_per_year),
-        "hit_ratio": hit_ratio(rets),
-        "avg_daily_ret": float(rets.mean()) if len(rets) else float("nan"),
-        "std_daily_ret": float(rets.std()) if len(rets) else float("nan"),
+        "start_equity": float(eq[0]),
+        "end_equity": float(eq[-1]),
+        "total_return": float(eq[-1] / eq[0] - 1.0),
+        "cagr": m["cagr"],
+        "ann_vol": m["ann_vol"],
+        "sharpe": m["sharpe"],
+        "sortino": m["sortino"],
+        "max_drawdown": m["max_drawdown"],
+        "calmar": m["calmar"],
+        "hit_ratio": m["hit_ratio"],
+        "avg_daily_ret": m["avg_daily_ret"],
+        "std_daily_ret": m["std_daily_ret"],
     }
     return metrics
 
 
-def _save_plot(figpath: Path):
+# DPI de los PNG batch (90 vs 100 por defecto: ~19% menos píxeles que rasterizar y comprimir)
+PLOT_DPI = 90
+
+
+def _save_plot(fig, figpath: Path):
+    # Se cierra la figura concreta (no el estado global de pyplot) para liberar memoria
     figpath.parent.mkdir(parents=True, exist_ok=True)
-    plt.tight_layout()
-    plt.savefig(figpath)
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(figpath, dpi=PLOT_DPI, bbox_inches="tight")
+    plt.close(fig)
 
 
 def plot_equity_compare(daily_a: pd.DataFrame, daily_b: pd.DataFrame, label_a: str, label_b: str, figpath: Path):
-    plt.figure()
-    daily_a["equity"].astype(float).plot(label=label_a)
-    daily_b["equity"].astype(float).plot(label=label_b)
-    plt.title("Equity Curve Comparison")
-    plt.xlabel("Date")
-    plt.ylabel("Equity")
-    plt.legend()
-    _save_plot(figpath)
+    fig, ax = plt.subplots()
+    daily_a["equity"].plot(ax=ax, label=label_a)
+    daily_b["equity"].plot(ax=ax, label=label_b)
+    ax.set_title("Equity Curve Comparison")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Equity")
+    ax.legend()
+    _save_plot(fig, figpath)
 
 
 def plot_drawdown_compare(daily_a: pd.DataFrame, daily_b: pd.DataFrame, label_a: str, label_b: str, figpath: Path):
     dda = drawdown_series(daily_a["equity"])
     ddb = drawdown_series(daily_b["equity"])
 
-    plt.figure()
-    dda.plot(label=label_a)
-    ddb.plot(label=label_b)
-    plt.title("Drawdown Comparison")
-    plt.xlabel("Date")
-    plt.ylabel("Drawdown")
-    plt.legend()
-    _save_plot(figpath)
-
-
-def plot_returns_hist(daily: pd.DataFrame, title: str, figpath: Path):
-    rets = equity_to_returns(daily["equity"])
-    plt.figure()
-    plt.hist(rets.values, bins=60)
-    plt.title(title)
-    plt.xlabel("Daily Return")
-    plt.ylabel("Frequency")
-    _save_plot(figpath)
-
-
-def plot_rolling_vol_compare(daily_a: pd.DataFrame, daily_b: pd.DataFrame, cfg: AnalyticsConfig, label_a: str, label_b: str, figpath: Path):
-    ra = equity_to_returns(daily_a["equity"])
-    rb = equity_to_returns(daily_b["equity"])
+    fig, ax = plt.subplots()
+    dda.plot(ax=ax, label=label_a)
+    ddb.plot(ax=ax, label=label_b)
+    ax.set_title("Drawdown Comparison")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Drawdown")
+    ax.legend()
+    _save_plot(fig, figpath)
+
+
+def plot_returns_hist(daily: pd.DataFrame, title: str, figpath: Path, returns: Optional[pd.Series] = None):
+    rets = equity_to_returns(daily["equity"]) if returns is None else returns
+    # Binning en NumPy y un único StepPatch (stairs) en lugar de 60 Rectangles de ax.hist
+    counts, edges = np.histogram(rets.to_numpy(), bins=60)
+    fig, ax = plt.subplots()
+    ax.stairs(counts, edges, fill=True)
+    ax.set_title(title)
+    ax.set_xlabel("Daily Return")
+    ax.set_ylabel("Frequency")
+    _save_plot(fig, figpath)
+
+
+def plot_rolling_vol_compare(
+    daily_a: pd.DataFrame,
+    daily_b: pd.DataFrame,
+    cfg: AnalyticsConfig,
+    label_a: str,
+    label_b: str,
+    figpath: Path,
+    returns_a: Optional[pd.Series] = None,
+    returns_b: Optional[pd.Series] = None,
+):
+    ra = equity_to_returns(daily_a["equity"]) if returns_a is None else returns_a
+    rb = equity_to_returns(daily_b["equity"]) if returns_b is None else returns_b
     v_a = rolling_vol(ra, window=cfg.rolling_vol_window, periods_per_year=cfg.periods_per_year)
     v_b = rolling_vol(rb, window=cfg.rolling_vol_window, periods_per_year=cfg.periods_per_year)
 
-    plt.figure()
-    v_a.plot(label=label_a)
-    v_b.plot(label=label_b)
-    plt.title(f"Rolling Volatility ({cfg.rolling_vol_window}d)")
-    plt.xlabel("Date")
-    plt.ylabel("Annualized Vol")
-    plt.legend()
-    _save_plot(figpath)
+    fig, ax = plt.subplots()
+    v_a.plot(ax=ax, label=label_a)
+    v_b.plot(ax=ax, label=label_b)
+    ax.set_title(f"Rolling Volatility ({cfg.rolling_vol_window}d)")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Annualized Vol")
+    ax.legend()
+    _save_plot(fig, figpath)
 
 
 def load_daily_csv(path: Path) -> pd.DataFrame:
-    df = pd.read_csv(path)
-    # Soporta index guardado como primera columna
-    if "datetime" in df.columns:
-        df["datetime"] = pd.to_datetime(df["datetime"])
-        df = df.set_index("datetime")
+    # Soporta index guardado como primera columna ("datetime" o, sin nombre, "Unnamed: 0")
+    header = pd.read_csv(path, nrows=0).columns
+    if "datetime" in header:
+        date_pos = header.get_loc("datetime")
+    elif "Unnamed: 0" in header:
+        date_pos = header.get_loc("Unnamed: 0")
     else:
-        # si se guardó con index -> suele llamarse "datetime" al leer; si no, "Unnamed: 0"
-        if "Unnamed: 0" in df.columns:
-            df["Unnamed: 0"] = pd.to_datetime(df["Unnamed: 0"])
-            df = df.rename(columns={"Unnamed: 0": "datetime"}).set_index("datetime")
-        else:
-            raise ValueError(f"No encuentro columna datetime en {path.name}")
-    df = df.sort_index()
+        raise ValueError(f"No encuentro columna datetime en {path.name}")
+
+    # Parser C de pyarrow con la fecha ya tipada (sin pd.to_datetime posterior).
+    # Columna por posición: pyarrow llama "" a la columna sin nombre (el parser C, "Unnamed: 0")
+    df = pd.read_csv(path, engine="pyarrow", parse_dates=[date_pos])
+    df = df.rename(columns={df.columns[date_pos]: "datetime"}).set_index("datetime")
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
     return df
 
 
+def load_daily(path: Path) -> pd.DataFrame:
+    """
+    Carga un daily_*.parquet (index datetime nativo) o, por compatibilidad, un CSV.
+    """
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path).sort_index()
+    return load_daily_csv(path)
+
+
 def run_analytics(
     daily_nohedge_path: Path,
     daily_hedged_path: Path,
@@ -211,33 +361,42 @@ def run_analytics(
     label_hedged: str = "Delta-Hedged",
 ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
-    Carga CSVs, calcula métricas, genera plots.
+    Carga daily (Parquet o CSV), calcula métricas, genera plots.
     Devuelve: daily_no, daily_h, summary_df
     """
     out_results_dir.mkdir(parents=True, exist_ok=True)
     out_figures_dir.mkdir(parents=True, exist_ok=True)
 
-    daily_no = load_daily_csv(daily_nohedge_path)
-    daily_h = load_daily_csv(daily_hedged_path)
+    daily_no = load_daily(daily_nohedge_path)
+    daily_h = load_daily(daily_hedged_path)
+
+    # Retornos una sola vez por estrategia: los comparten métricas, rolling vol e histogramas
+    rets_no = equity_to_returns(daily_no["equity"])
+    rets_h = equity_to_returns(daily_h["equity"])
 
-    m_no = compute_metrics(daily_no, cfg)
-    m_h = compute_metrics(daily_h, cfg)
+    m_no = compute_metrics(daily_no, cfg, returns=rets_no)
+    m_h = compute_metrics(daily_h, cfg, returns=rets_h)
 
     summary = pd.DataFrame([
         {"strategy": label_nohedge, **m_no},
         {"strategy": label_hedged, **m_h},
     ])
 
+    # CSV con el writer de pandas a propósito: pyarrow.csv no es round-trip exacto en float64
+    # (15-16 dígitos) y cambia el formato de fechas. Los daily/trades grandes ya van en Parquet.
     summary.to_csv(out_results_dir / "summary_metrics.csv", index=False)
 
     # Plots comparativos
     plot_equity_compare(daily_no, daily_h, label_nohedge, label_hedged, out_figures_dir / "equity_compare.png")
     plot_drawdown_compare(daily_no, daily_h, label_nohedge, label_hedged, out_figures_dir / "drawdown_compare.png")
-    plot_rolling_vol_compare(daily_no, daily_h, cfg, label_nohedge, label_hedged, out_figures_dir / "rolling_vol_compare.png")
+    plot_rolling_vol_compare(
+        daily_no, daily_h, cfg, label_nohedge, label_hedged, out_figures_dir / "rolling_vol_compare.png",
+        returns_a=rets_no, returns_b=rets_h,
+    )
 
     # Plots individuales
-    plot_returns_hist(daily_no, f"Daily Returns Histogram - {label_nohedge}", out_figures_dir / "hist_returns_nohedge.png")
-    plot_returns_hist(daily_h, f"Daily Returns Histogram - {label_hedged}", out_figures_dir / "hist_returns_deltahedged.png")
+    plot_returns_hist(daily_no, f"Daily Returns Histogram - {label_nohedge}", out_figures_dir / "hist_returns_nohedge.png", returns=rets_no)
+    plot_returns_hist(daily_h, f"Daily Returns Histogram - {label_hedged}", out_figures_dir / "hist_returns_deltahedged.png", returns=rets_h)
 
     return daily_no, daily_h, summary
 
@@ -4,11 +4,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Literal, Dict, Any
+from typing import Literal, Dict, Any, Union
 
 import numpy as np
 
-from src.pricing import bs_price_greeks, straddle_greeks
+from src.pricing import bs_greeks_vec, straddle_greeks
 
 
 Right = Literal["C", "P"]
@@ -16,10 +16,11 @@ Right = Literal["C", "P"]
 
 @dataclass
 class DeltaNeutralOptionHedgeResult:
-    n_hedge: float
+    # float con un solo escenario; arrays (uno por strike) si K_hedge/hedge_right son arrays
+    n_hedge: Union[float, np.ndarray]
     base: Dict[str, float]
-    hedge: Dict[str, float]
-    total: Dict[str, float]
+    hedge: Dict[str, Union[float, np.ndarray]]
+    total: Dict[str, Union[float, np.ndarray]]
 
 
 def _scale_greeks(g: Dict[str, float], factor: float) -> Dict[str, float]:
@@ -29,49 +30,44 @@ def _scale_greeks(g: Dict[str, float], factor: float) -> Dict[str, float]:
 def delta_neutral_with_option(
     S: float,
     K_straddle: float,
-    K_hedge: float,
+    K_hedge: Union[float, np.ndarray],
     T: float,
     r: float,
     sigma: float,
     q: float = 0.0,
-    hedge_right: Right = "C",
+    hedge_right: Union[Right, np.ndarray] = "C",
     days_in_year: int = 365
 ) -> DeltaNeutralOptionHedgeResult:
     """
     Neutraliza delta del straddle usando OTRA opción (call o put).
     Devuelve n (cantidad de hedge option) y el impacto en Gamma/Vega/Theta.
     Todo en unidades "por 1 acción" (sin multiplicador ni contratos).
+
+    K_hedge / hedge_right pueden ser arrays alineados (un escenario por elemento):
+    d1/d2 y griegas de todas las opciones hedge van en una sola pasada vectorizada.
+    Con escalares se devuelven floats; con arrays, arrays (base es común a todos).
     """
+    scalar = np.ndim(K_hedge) == 0 and np.ndim(hedge_right) == 0
 
     # Base: straddle
     base = straddle_greeks(S, K_straddle, T, r, sigma, q=q, days_in_year=days_in_year)
 
-    # Hedge option
-    h = bs_price_greeks(S, K_hedge, T, r, sigma, hedge_right, q=q, days_in_year=days_in_year)
-    hedge = {
-        "price": h.price,
-        "delta": h.delta,
-        "gamma": h.gamma,
-        "vega_1pct": h.vega_1pct,
-        "theta_day": h.theta_day,
-    }
+    # Hedge option(s): call=+1 / put=-1
+    sign = np.where(np.asarray(hedge_right) == "C", 1.0, -1.0)
+    hedge = bs_greeks_vec(S, K_hedge, T, r, sigma, sign, q=q, days_in_year=days_in_year)
+    if scalar:
+        hedge = {k: float(v) for k, v in hedge.items()}
 
     # n para delta-neutral: base_delta + n*hedge_delta = 0
-    if abs(hedge["delta"]) < 1e-8:
+    if np.any(np.abs(hedge["delta"]) < 1e-8):
         raise ValueError("Delta de la opción hedge ~0; no se puede neutralizar delta con esta opción.")
 
     n = - base["delta"] / hedge["delta"]
 
-    total = {
-        "price": base["price"] + n * hedge["price"],
-        "delta": base["delta"] + n * hedge["delta"],
-        "gamma": base["gamma"] + n * hedge["gamma"],
-        "vega_1pct": base["vega_1pct"] + n * hedge["vega_1pct"],
-        "theta_day": base["theta_day"] + n * hedge["theta_day"],
-    }
+    total = {k: base[k] + n * hedge[k] for k in ("price", "delta", "gamma", "vega_1pct", "theta_day")}
 
     return DeltaNeutralOptionHedgeResult(
-        n_hedge=float(n),
+        n_hedge=float(n) if scalar else n,
         base=base,
         hedge=hedge,
         total=total
@@ -3,12 +3,15 @@
 
 from __future__ import annotations
 
+import math
 from dataclasses import dataclass
 from typing import Dict, Tuple, Literal
 
 import numpy as np
+from numba import njit, prange
 
-from src.pricing import bs_price_greeks
+from src.pricing import bs_price_greeks, bs_price_vec, _bs_kernel, _straddle_prices, _norm_cdf_nb
+from src.utils import NUMBA_FASTMATH
 
 
 LegOrder = Literal["C_then_P", "P_then_C"]
@@ -40,10 +43,9 @@ def price_straddle_combo(
     """
     Precio de ejecución del straddle como COMBO (sin legging).
     """
-    call = bs_price_greeks(S, K, T, r, sigma, "C", q=q)
-    put  = bs_price_greeks(S, K, T, r, sigma, "P", q=q)
+    call, put = _straddle_prices(S, K, T, r, sigma, q=q)
 
-    raw = (call.price + put.price)
+    raw = (call + put)
     px = _apply_slippage(raw, params.slippage_bps_combo)
 
     total = px * params.contracts * params.multiplier
@@ -54,6 +56,47 @@ def price_straddle_combo(
     }
 
 
+@njit(cache=True, fastmath=NUMBA_FASTMATH)
+def _bs_price_hoisted(
+    S: float, K: float, is_call: bool,
+    drift_T: float, sig_sqrtT: float, disc_r: float, disc_q: float
+) -> float:
+    """
+    Precio BS con los términos que solo dependen de (K, T, r, q, sigma) ya calculados
+    (drift_T = (r - q + sigma^2/2)*T, sigma*sqrt(T), e^{-rT}, e^{-qT}).
+    Misma aritmética que _bs_kernel; para muchas S con el mismo contrato.
+    """
+    if S <= 0:
+        return math.nan
+    d1 = (math.log(S / K) + drift_T) / sig_sqrtT
+    d2 = d1 - sig_sqrtT
+    if is_call:
+        return disc_q * S * _norm_cdf_nb(d1) - disc_r * K * _norm_cdf_nb(d2)
+    return disc_r * K * _norm_cdf_nb(-d2) - disc_q * S * _norm_cdf_nb(-d1)
+
+
+@njit(parallel=True, cache=True, fastmath=NUMBA_FASTMATH)
+def _leg2_prices(
+    S2: np.ndarray, K: float, T: float, r: float, sigma: float, q: float, is_call: bool
+) -> np.ndarray:
+    """
+    Precio de la pata 2 para todas las simulaciones: constantes de T fuera del bucle,
+    un solo log + 2 CDF por simulación.
+    """
+    out = np.empty(S2.size)
+    if K <= 0 or T <= 0 or sigma <= 0:
+        out[:] = math.nan
+        return out
+
+    sig_sqrtT = sigma * math.sqrt(T)
+    drift_T = (r - q + 0.5 * sigma * sigma) * T
+    disc_r = math.exp(-r * T)
+    disc_q = math.exp(-q * T)
+    for i in prange(S2.size):
+        out[i] = _bs_price_hoisted(S2[i], K, is_call, drift_T, sig_sqrtT, disc_r, disc_q)
+    return out
+
+
 def simulate_legging_cost(
     S: float, K: float, T: float, r: float, sigma: float, q: float,
     params: ExecutionParams,
@@ -67,49 +110,189 @@ def simulate_legging_cost(
 
     dt_years = params.leg_delay_seconds / params.seconds_in_year
 
-    # Movimiento del subyacente durante el delay (GBM approx en nivel, suficiente para práctica)
-    dS = rng.normal(loc=0.0, scale=S * sigma * np.sqrt(dt_years), size=params.n_sims)
-    S2 = S + dS
-
-    # Precios pata 1 en S (antes del delay)
-    call1 = bs_price_greeks(S, K, T, r, sigma, "C", q=q).price
-    put1  = bs_price_greeks(S, K, T, r, sigma, "P", q=q).price
+    # Movimiento del subyacente durante el delay (GBM approx en nivel, suficiente para práctica).
+    # Mismo stream que rng.normal(0, scale): S2 = S + scale*Z escalado in-place, sin arrays intermedios
+    S2 = rng.standard_normal(params.n_sims)
+    S2 *= S * sigma * math.sqrt(dt_years)
+    S2 += S
 
-    # Precios pata 2 en S2 (después del delay)
-    call2 = np.array([bs_price_greeks(float(s), K, T, r, sigma, "C", q=q).price for s in S2])
-    put2  = np.array([bs_price_greeks(float(s), K, T, r, sigma, "P", q=q).price for s in S2])
+    # Precios pata 1 en S (antes del delay): call y put en una sola evaluación.
+    # exact: la pata 2 (_leg2_prices) no se cuantiza, así que la 1 tampoco aunque BS_QUANTIZE
+    call1, put1 = _straddle_prices(S, K, T, r, sigma, q=q, exact=True)
 
-    # Coste total por simulación
+    # Precios pata 2 en S2 (después del delay): kernel Numba sobre todas las sims,
+    # y solo la pata que se ejecuta en segundo lugar
+    args = (S2, float(K), float(T), float(r), float(sigma), float(q))
     if order == "C_then_P":
-        raw_legs = call1 + put2
+        leg1, leg2 = call1, _leg2_prices(*args, False)
     else:
-        raw_legs = put1 + call2
+        leg1, leg2 = put1, _leg2_prices(*args, True)
 
-    exec_legs = _apply_slippage(raw_legs, params.slippage_bps_leg)
+    # combo baseline: mismo S/K/T que la pata 1 -> se reutilizan call1 + put1
+    combo_exec = _apply_slippage(call1 + put1, params.slippage_bps_combo)
 
-    # combo baseline
-    combo = price_straddle_combo(S, K, T, r, sigma, q, params)
-    combo_exec = combo["exec_straddle"]
+    # exec_legs = (leg1 + leg2) * k y extra = exec_legs - combo_exec son afines y crecientes en leg2:
+    # media y percentiles se toman una vez sobre leg2 y se transforman como escalares,
+    # sin arrays intermedios de n_sims (un solo quantile -> una ordenación para p50/p90/p99)
+    leg2_mean = np.mean(leg2)
+    leg2_pcts = np.quantile(leg2, [0.5, 0.9, 0.99])
+    legs_mean = float(_apply_slippage(leg1 + leg2_mean, params.slippage_bps_leg))
+    extra_mean = legs_mean - combo_exec
+    p50, p90, p99 = (_apply_slippage(leg1 + leg2_pcts, params.slippage_bps_leg) - combo_exec).tolist()
+
+    # multiplicadores (escala lineal -> se aplica a medias y percentiles)
+    mult = params.contracts * params.multiplier
+
+    return {
+        "combo_exec": float(combo_exec),
+        "legs_exec_mean": legs_mean,
+        "legging_extra_mean": extra_mean,
+        "legging_extra_p50": p50,
+        "legging_extra_p90": p90,
+        "legging_extra_p99": p99,
+
+        "total_cost_legs_mean": legs_mean * mult,
+        "total_extra_mean": extra_mean * mult,
+        "total_extra_p90": p90 * mult,
+        "total_extra_p99": p99 * mult,
+    }
+
+
+@njit(cache=True, fastmath=NUMBA_FASTMATH)
+def _lerp(a: float, b: float, t: float) -> float:
+    # Interpolación lineal de np.percentile (forma simétrica según t)
+    d = b - a
+    return b - d * (1.0 - t) if t >= 0.5 else a + d * t
+
+
+@njit(parallel=True, cache=True, fastmath=NUMBA_FASTMATH, error_model="numpy")
+def _legging_stats_kernel(
+    S: np.ndarray, K: np.ndarray, T: np.ndarray, sigma: np.ndarray,
+    combo_exec: np.ndarray, Z: np.ndarray,
+    r: float, q: float, dt_years: float, call_first: bool, leg_factor: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Monte-Carlo de legging, una fila (apertura) por hilo:
+    pata 1 en S, pata 2 en S2 = S + S*sigma*sqrt(dt)*Z, slippage de patas = *leg_factor.
+
+    Z tiene que venir ordenado ascendente. El extra es monótono en Z (creciente si la pata 2
+    es la call, decreciente si es la put), así que el k-ésimo menor extra es el de Z[k]
+    (o Z[m-1-k]): los percentiles salen evaluando solo esas posiciones, sin ordenar
+    ni guardar un array de n_sims por fila.
+
+    Devuelve por fila: media del coste por patas, media del extra vs combo
+    y percentiles 50/90/99 del extra (matriz (N, 3)).
+    """
+    n = S.shape[0]
+    m = Z.shape[0]
+    sqrt_dt = math.sqrt(dt_years)
+    pcts = np.array([50.0, 90.0, 99.0])
 
-    extra = exec_legs - combo_exec
+    legs_mean = np.empty(n)
+    extra_mean = np.empty(n)
+    extra_pcts = np.empty((n, 3))
 
-    # multiplicadores
-    total_exec_legs = exec_legs * params.contracts * params.multiplier
-    total_extra = extra * params.contracts * params.multiplier
+    for i in prange(n):
+        leg1 = _bs_kernel(S[i], K[i], T[i], r, sigma[i], call_first, q, 365.0)[0]
+        scale = S[i] * sigma[i] * sqrt_dt
 
-    def pct(x, p): return float(np.percentile(x, p))
+        # Constantes de la fila (T, sigma) fuera del bucle de simulaciones
+        valid = K[i] > 0 and T[i] > 0 and sigma[i] > 0
+        sig_sqrtT = sigma[i] * math.sqrt(T[i]) if valid else math.nan
+        drift_T = (r - q + 0.5 * sigma[i] * sigma[i]) * T[i]
+        disc_r = math.exp(-r * T[i])
+        disc_q = math.exp(-q * T[i])
+
+        sum_legs = 0.0
+        sum_extra = 0.0
+        for j in range(m):
+            S2 = S[i] + scale * Z[j]
+            leg2 = _bs_price_hoisted(S2, K[i], not call_first, drift_T, sig_sqrtT, disc_r, disc_q) if valid else math.nan
+            exec_legs = (leg1 + leg2) * leg_factor
+            sum_legs += exec_legs
+            sum_extra += exec_legs - combo_exec[i]
+
+        legs_mean[i] = sum_legs / m
+        extra_mean[i] = sum_extra / m
+
+        # Cualquier NaN en las simulaciones -> percentiles NaN (como np.percentile)
+        if math.isnan(sum_extra):
+            extra_pcts[i, :] = math.nan
+            continue
+        for k in range(3):
+            pos = pcts[k] / 100.0 * (m - 1)
+            lo = int(math.floor(pos))
+            hi = min(lo + 1, m - 1)
+            # pata 2 = put (call_first) -> extra decreciente en Z -> rangos invertidos
+            j_lo = m - 1 - lo if call_first else lo
+            j_hi = m - 1 - hi if call_first else hi
+            e_lo = (leg1 + _bs_price_hoisted(S[i] + scale * Z[j_lo], K[i], not call_first, drift_T, sig_sqrtT, disc_r, disc_q)) * leg_factor - combo_exec[i]
+            e_hi = (leg1 + _bs_price_hoisted(S[i] + scale * Z[j_hi], K[i], not call_first, drift_T, sig_sqrtT, disc_r, disc_q)) * leg_factor - combo_exec[i]
+            extra_pcts[i, k] = _lerp(e_lo, e_hi, pos - lo)
+
+    return legs_mean, extra_mean, extra_pcts
+
+
+def simulate_legging_cost_batch(
+    S: np.ndarray, K: np.ndarray, T: np.ndarray, sigma: np.ndarray,
+    params: ExecutionParams,
+    r: float = 0.0, q: float = 0.0,
+    order: LegOrder = "C_then_P"
+) -> Dict[str, np.ndarray]:
+    """
+    simulate_legging_cost para N aperturas a la vez (arrays alineados S/K/T/sigma).
+    Todas las filas comparten las mismas n_sims normales (misma seed), igual que
+    llamando a simulate_legging_cost fila a fila.
+    Devuelve las mismas claves, cada una como array de longitud N.
+    """
+    S = np.ascontiguousarray(S, dtype=np.float64)
+    K = np.ascontiguousarray(K, dtype=np.float64)
+    T = np.ascontiguousarray(T, dtype=np.float64)
+    sigma = np.ascontiguousarray(sigma, dtype=np.float64)
+
+    rng = np.random.default_rng(params.seed)
+
+    dt_years = params.leg_delay_seconds / params.seconds_in_year
+
+    # Normales comunes a todas las filas (la seed no depende del nº de hilos).
+    # Ordenadas una sola vez para todas las filas: el kernel saca los percentiles por rango
+    Z = np.sort(rng.standard_normal(params.n_sims))
+
+    # combo baseline
+    call1 = bs_price_vec(S, K, T, r, sigma, "C", q=q)
+    put1 = bs_price_vec(S, K, T, r, sigma, "P", q=q)
+    combo_exec = _apply_slippage(call1 + put1, params.slippage_bps_combo)
+
+    legs_mean, extra_mean, extra_pcts = _legging_stats_kernel(
+        S, K, T, sigma, combo_exec, Z,
+        r, q, dt_years, order == "C_then_P", _apply_slippage(1.0, params.slippage_bps_leg)
+    )
+
+    # multiplicadores (escala lineal -> se aplica a medias y percentiles)
+    mult = params.contracts * params.multiplier
 
     return {
-        "combo_exec": float(combo_exec),
-        "legs_exec_mean": float(np.mean(exec_legs)),
-        "legging_extra_mean": float(np.mean(extra)),
-        "legging_extra_p50": pct(extra, 50),
-        "legging_extra_p90": pct(extra, 90),
-        "legging_extra_p99": pct(extra, 99),
-
-        "total_cost_legs_mean": float(np.mean(total_exec_legs)),
-        "total_extra_mean": float(np.mean(total_extra)),
-        "total_extra_p90": pct(total_extra, 90),
-        "total_extra_p99": pct(total_extra, 99),
+        "combo_exec": combo_exec,
+        "legs_exec_mean": legs_mean,
+        "legging_extra_mean": extra_mean,
+        "legging_extra_p50": extra_pcts[:, 0],
+        "legging_extra_p90": extra_pcts[:, 1],
+        "legging_extra_p99": extra_pcts[:, 2],
+
+        "total_cost_legs_mean": legs_mean * mult,
+        "total_extra_mean": extra_mean * mult,
+        "total_extra_p90": extra_pcts[:, 1] * mult,
+        "total_extra_p99": extra_pcts[:, 2] * mult,
     }
 
+
+def warmup_jit() -> None:
+    """
+    Compila (o carga de la caché de Numba) los kernels antes de usarlos,
+    para que el primer cálculo del pipeline no incluya el tiempo de JIT.
+    """
+    bs_price_greeks(100.0, 100.0, 0.1, 0.0, 0.2, "C")
+    _straddle_prices(100.0, 100.0, 0.1, 0.0, 0.2)
+    one = np.ones(1)
+    _leg2_prices(100.0 * one, 100.0, 0.1, 0.0, 0.2, 0.0, False)
+    _legging_stats_kernel(100.0 * one, 100.0 * one, 0.1 * one, 0.2 * one, 5.0 * one, np.zeros(1), 0.0, 0.0, 1e-7, True, 1.0)
@@ -0,0 +1,88 @@
+# src/ibkr_cache.py
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import hashlib
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable
+
+import pandas as pd
+
+from src.ibkr_data import IBKRData, vix_frame
+
+
+ROOT = Path(__file__).resolve().parents[1]
+CACHE_DIR = ROOT / "outputs" / "cache"
+
+
+def _cache_path(spec: str, duration: str, bar_size: str, cache_dir: Path) -> Path:
+    # La fecha entra en la clave: como mucho una descarga por símbolo y día
+    key = hashlib.blake2b(f"{spec}|{duration}|{bar_size}|{date.today()}".encode()).hexdigest()[:16]
+    return cache_dir / f"{spec}_{key}.parquet"
+
+
+def cached_bars(
+    ibd: IBKRData,
+    spec: str,
+    duration: str = "5 Y",
+    bar_size: str = "1 day",
+    cache_dir: Path = CACHE_DIR
+) -> pd.DataFrame:
+    """
+    Barras históricas con caché diaria en Parquet (outputs/cache).
+    - spec: símbolo de la acción (ej "SPY") o "VIX" para el índice (columna vix_close).
+
+    Solo conecta con IBKR si no hay caché; el caller sigue siendo
+    responsable de ibd.disconnect().
+    """
+    # Un solo sitio con la lógica de clave/ruta/escritura: cached_bars_many
+    return cached_bars_many(ibd, [spec], duration=duration, bar_size=bar_size, cache_dir=cache_dir)[spec]
+
+
+def cached_bars_many(
+    ibd: IBKRData,
+    specs: Iterable[str],
+    duration: str = "5 Y",
+    bar_size: str = "1 day",
+    cache_dir: Path = CACHE_DIR
+) -> Dict[str, pd.DataFrame]:
+    """
+    Barras históricas con caché diaria en Parquet (outputs/cache) para varios símbolos:
+    los que no están en caché se descargan en paralelo (IBKRData.historical_bars_many)
+    en lugar de uno tras otro. Devuelve {spec: DataFrame}.
+
+    Solo conecta con IBKR si falta alguno en caché; el caller sigue siendo
+    responsable de ibd.disconnect().
+    """
+    out: Dict[str, pd.DataFrame] = {}
+    missing = []
+    for spec in specs:
+        path = _cache_path(spec, duration, bar_size, cache_dir)
+        if path.exists():
+            out[spec] = pd.read_parquet(path)
+        else:
+            missing.append(spec)
+
+    if not missing:
+        return out
+
+    if not ibd.ib.isConnected():
+        ibd.connect()
+
+    contracts = [
+        ibd.index("VIX", exchange="CBOE", currency="USD") if spec == "VIX" else ibd.stock(spec)
+        for spec in missing
+    ]
+    dfs = ibd.historical_bars_many(contracts, duration=duration, bar_size=bar_size, what="TRADES", use_rth=True)
+
+    for spec, df in zip(missing, dfs):
+        if spec == "VIX":
+            df = vix_frame(df)
+        if not df.empty:
+            path = _cache_path(spec, duration, bar_size, cache_dir)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(path, compression="zstd")
+        out[spec] = df
+    return out
@@ -15,13 +15,19 @@ except RuntimeError:
 # ======================================================
 # Imports
 # ======================================================
+import hashlib
 import math
+import time
 from dataclasses import dataclass
-from typing import Iterable, Tuple, Dict, Any
+from pathlib import Path
+from typing import Iterable, Tuple, Dict, Any, Optional
 
+import numpy as np
 import pandas as pd
 from ib_insync import IB, Stock, Option, Index, util
 
+from src.utils import naive_datetime
+
 
 # =============================
 # Helpers
@@ -59,6 +65,36 @@ def mid_price(ticker) -> float:
     return float("nan")
 
 
+_BAR_FLOAT_FIELDS = ("open", "high", "low", "close", "volume", "average")
+
+
+def _bars_to_arrays(bars) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Lista de BarData -> (fechas, {campo: array}) en una pasada, sin DataFrame.
+    Fechas tal cual las da IBKR (date/datetime, objeto); precios/volumen float64, barCount int64.
+    """
+    n = len(bars)
+    dates = np.empty(n, dtype=object)
+    cols = {f: np.empty(n, dtype=np.float64) for f in _BAR_FLOAT_FIELDS}
+    cols["barCount"] = np.empty(n, dtype=np.int64)
+    for i, b in enumerate(bars):
+        dates[i] = b.date
+        for f in _BAR_FLOAT_FIELDS:
+            cols[f][i] = getattr(b, f)
+        cols["barCount"][i] = b.barCount
+    return dates, cols
+
+
+def vix_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Barras del índice VIX -> columnas datetime, vix_close."""
+    if df.empty:
+        return df
+
+    df = df[["datetime", "close"]].copy()
+    df = df.rename(columns={"close": "vix_close"})
+    return df
+
+
 # =============================
 # Config
 # =============================
@@ -79,6 +115,10 @@ class IBKRConfig:
     # Filtrar warnings típicos de subscripción
     suppress_error_codes: tuple[int, ...] = (10089, 10091)
 
+    # Caché en disco (Parquet) de historical_bars; None = sin caché
+    cache_dir: Optional[Path] = None
+    cache_ttl_seconds: float = 12 * 3600
+
 
 # =============================
 # Main class
@@ -147,6 +187,35 @@ class IBKRData:
     # -------------------------
     # Historical bars (CORE)
     # -------------------------
+    def _bars_cache_path(self, contract, end: str, duration: str, bar_size: str, what: str, use_rth: bool) -> Optional[Path]:
+        # Solo contratos cualificados: conId identifica el instrumento sin ambigüedad
+        if self.cfg.cache_dir is None or not getattr(contract, "conId", 0):
+            return None
+        key = hashlib.blake2b(
+            f"{contract.conId}|{end}|{duration}|{bar_size}|{what}|{use_rth}".encode()
+        ).hexdigest()[:16]
+        return Path(self.cfg.cache_dir) / f"bars_{contract.conId}_{key}.parquet"
+
+    def _cached_bars_df(self, path: Optional[Path]) -> Optional[pd.DataFrame]:
+        if path is not None and path.exists() and time.time() - path.stat().st_mtime < self.cfg.cache_ttl_seconds:
+            return pd.read_parquet(path)
+        return None
+
+    @staticmethod
+    def _bars_to_df(bars, path: Optional[Path]) -> pd.DataFrame:
+        dates, cols = _bars_to_arrays(bars)
+        if not len(dates):
+            return pd.DataFrame()
+
+        # DataFrame solo en la frontera de la API
+        df = pd.DataFrame({"datetime": naive_datetime(pd.Series(dates)), **cols})
+        df = df.sort_values("datetime").reset_index(drop=True)
+
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(path, compression="zstd")
+        return df
+
     def historical_bars(
         self,
         contract,
@@ -156,6 +225,17 @@ class IBKRData:
         what: str = "TRADES",
         use_rth: bool = True
     ) -> pd.DataFrame:
+        """
+        Barras históricas como DataFrame (columna datetime naive, ordenado).
+        Con cfg.cache_dir, las peticiones repetidas (mismo conId/end/duration/bar_size/what/use_rth)
+        se sirven desde Parquet mientras no superen cfg.cache_ttl_seconds: IBKR limita el ritmo
+        de peticiones históricas y es la latencia dominante.
+        """
+        path = self._bars_cache_path(contract, end, duration, bar_size, what, use_rth)
+        df = self._cached_bars_df(path)
+        if df is not None:
+            return df
+
         bars = self.ib.reqHistoricalData(
             contract,
             endDateTime=end,
@@ -166,16 +246,67 @@ class IBKRData:
             formatDate=1,
             keepUpToDate=False
         )
-        df = util.df(bars)
-        if df.empty:
+        return self._bars_to_df(bars, path)
+
+    async def historical_bars_async(
+        self,
+        contract,
+        end: str = "",
+        duration: str = "10 Y",
+        bar_size: str = "1 day",
+        what: str = "TRADES",
+        use_rth: bool = True
+    ) -> pd.DataFrame:
+        """Versión async de historical_bars (misma caché y mismo formato de salida)."""
+        path = self._bars_cache_path(contract, end, duration, bar_size, what, use_rth)
+        df = self._cached_bars_df(path)
+        if df is not None:
             return df
 
-        df = df.rename(columns={"date": "datetime"})
-        df["datetime"] = pd.to_datetime(df["datetime"]).dt.tz_localize(None)
-        df = df.sort_values("datetime").reset_index(drop=True)
-        return df
+        bars = await self.ib.reqHistoricalDataAsync(
+            contract,
+            endDateTime=end,
+            durationStr=duration,
+            barSizeSetting=bar_size,
+            whatToShow=what,
+            useRTH=use_rth,
+            formatDate=1,
+            keepUpToDate=False
+        )
+        return self._bars_to_df(bars, path)
+
+    def historical_bars_many(
+        self,
+        contracts: Iterable,
+        end: str = "",
+        duration: str = "10 Y",
+        bar_size: str = "1 day",
+        what: str = "TRADES",
+        use_rth: bool = True
+    ) -> list[pd.DataFrame]:
+        """
+        historical_bars para varios contratos con las peticiones en vuelo a la vez
+        (asyncio.gather): la latencia de red se paga una vez en lugar de una por contrato.
+        IBKR sigue aplicando su pacing; ib_insync encola lo que lo supere.
+        Devuelve los DataFrames en el mismo orden que contracts.
+        """
+        coros = [
+            self.historical_bars_async(c, end=end, duration=duration, bar_size=bar_size, what=what, use_rth=use_rth)
+            for c in contracts
+        ]
+        if not coros:
+            return []
+        return list(self.ib.run(asyncio.gather(*coros)))
 
     def last_close_from_history(self, contract, duration: str = "5 D", use_rth: bool = True) -> float:
+        # Con caché en disco: misma petición que historical_bars -> comparte su Parquet
+        if self.cfg.cache_dir is not None:
+            df = self.historical_bars(contract, duration=duration, bar_size="1 day", what="TRADES", use_rth=use_rth)
+            if df.empty:
+                return float("nan")
+            return float(df["close"].iloc[-1])
+
+        # Sin caché solo hace falta un escalar: última barra, sin DataFrame ni parseo de fechas
         bars = self.ib.reqHistoricalData(
             contract,
             endDateTime="",
@@ -226,11 +357,4 @@ class IBKRData:
             what="TRADES",
             use_rth=use_rth
         )
-
-        if df.empty:
-            return df
-
-        df = df[["datetime", "close"]].copy()
-        df = df.rename(columns={"close": "vix_close"})
-        return df
-
+        return vix_frame(df)
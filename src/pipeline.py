@@ -0,0 +1,59 @@
+# src/pipeline.py
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+import pandas as pd
+
+from src.ibkr_data import IBKRData, IBKRConfig
+from src.ibkr_cache import cached_bars_many
+from src.pricing import sigma_proxy_hv_vix
+
+
+@lru_cache(maxsize=1)
+def _sigma_dataframe(
+    duration: str,
+    bar_size: str,
+    hv_window: int,
+    vix_weight: float,
+    sigma_floor: float,
+    sigma_cap: float
+) -> pd.DataFrame:
+    cfg = IBKRConfig(host="127.0.0.1", port=7497, client_id=28, use_market_data=False)
+    ibd = IBKRData(cfg)
+
+    try:
+        # SPY y VIX en una sola ronda de peticiones concurrentes
+        bars = cached_bars_many(ibd, ["SPY", "VIX"], duration=duration, bar_size=bar_size)
+        df_spy = bars["SPY"][["datetime", "close"]]
+        df_vix = bars["VIX"]
+    finally:
+        ibd.disconnect()
+
+    return sigma_proxy_hv_vix(
+        df_spy=df_spy,
+        df_vix=df_vix,
+        hv_window=hv_window,
+        hv_annualization=252,
+        vix_weight=vix_weight,
+        sigma_floor=sigma_floor,
+        sigma_cap=sigma_cap,
+    )
+
+
+def get_sigma_dataframe(
+    duration: str = "5 Y",
+    bar_size: str = "1 day",
+    hv_window: int = 20,
+    vix_weight: float = 0.6,
+    sigma_floor: float = 0.05,
+    sigma_cap: float = 2.0
+) -> pd.DataFrame:
+    """
+    SPY + VIX (caché Parquet) -> sigma proxy HV/VIX.
+    Memoizado en proceso: varias etapas/scripts en la misma sesión no repiten IBKR ni el cálculo.
+    Devuelve una copia para que el caller pueda modificarla sin tocar la caché.
+    """
+    return _sigma_dataframe(duration, bar_size, hv_window, vix_weight, sigma_floor, sigma_cap).copy()
@@ -3,12 +3,24 @@
 
 from __future__ import annotations
 
+import hashlib
 import math
 from dataclasses import dataclass
-from typing import Literal, Dict
+from functools import lru_cache
+from pathlib import Path
+from typing import Literal, Dict, Tuple
 
 import numpy as np
 import pandas as pd
+from numba import njit
+from scipy.special import ndtr
+
+try:
+    import bottleneck as bn
+except ImportError:  # opcional: sin bottleneck se usa pandas rolling
+    bn = None
+
+from src.utils import NUMBA_FASTMATH, naive_datetime
 
 OptionType = Literal["C", "P"]
 
@@ -17,12 +29,18 @@ OptionType = Literal["C", "P"]
 # Normal PDF / CDF
 # =========================
 _INV_SQRT_2PI = 1.0 / math.sqrt(2.0 * math.pi)
+_INV_SQRT_2 = 1.0 / math.sqrt(2.0)
 
 def norm_pdf(x: float) -> float:
     return _INV_SQRT_2PI * math.exp(-0.5 * x * x)
 
 def norm_cdf(x: float) -> float:
-    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+    # Misma formulación que scipy.special.ndtr: erfc no pierde precisión en la cola izquierda
+    return 0.5 * math.erfc(-x * _INV_SQRT_2)
+
+# Versiones Numba para los kernels compilados
+_norm_pdf_nb = njit(cache=True, fastmath=NUMBA_FASTMATH)(norm_pdf)
+_norm_cdf_nb = njit(cache=True, fastmath=NUMBA_FASTMATH)(norm_cdf)
 
 
 # =========================
@@ -32,9 +50,15 @@ def hist_vol_close(close: pd.Series, window: int = 20, annualization: int = 252)
     """
     Volatilidad histórica anualizada usando log-returns y rolling std.
     """
-    close = close.astype(float)
-    rets = np.log(close / close.shift(1))
-    return rets.rolling(window).std() * math.sqrt(annualization)
+    if close.dtype != np.float64:  # sin astype(copy=False): deprecado en pandas 3
+        close = close.astype(np.float64)
+    # log(c_t) - log(c_{t-1}): un solo log vectorizado, sin serie shift intermedia alineada
+    rets = np.log(close).diff()
+    if bn is None or len(rets) < window:
+        return rets.rolling(window).std() * math.sqrt(annualization)
+    # Ventana móvil en C (bottleneck); NaN hasta tener `window` retornos, como pandas
+    mv = bn.move_std(rets.to_numpy(), window=window, min_count=window, ddof=1)
+    return pd.Series(mv * math.sqrt(annualization), index=close.index, name=close.name)
 
 
 # =========================
@@ -49,63 +73,223 @@ class BSGreeks:
     theta_day: float    # cambio de precio por 1 día (convención 365 días)
 
 
-def bs_price_greeks(
+@njit(cache=True, fastmath=NUMBA_FASTMATH, error_model="numpy")
+def _bs_kernel(
     S: float,
     K: float,
-    T: float,               # años
+    T: float,
     r: float,
     sigma: float,
-    opt_type: OptionType,
-    q: float = 0.0,
-    days_in_year: int = 365
-) -> BSGreeks:
+    is_call: bool,
+    q: float,
+    days_in_year: float
+) -> Tuple[float, float, float, float, float]:
     """
-    Black-Scholes europea con dividend yield q.
-
-    Devuelve:
-    - vega_1pct: por +1 punto de vol (p.ej. 20%->21%)
-    - theta_day: por día (dividiendo la theta anual entre days_in_year)
-
-    Nota: internamente se calcula la theta "por año" (porque T está en años),
-    y luego se convierte a diaria.
+    Núcleo escalar (Numba) de bs_price_greeks.
+    Devuelve (price, delta, gamma, vega_1pct, theta_day); NaN si inputs inválidos.
     """
     if S <= 0 or K <= 0 or T <= 0 or sigma <= 0:
-        nan = float("nan")
-        return BSGreeks(nan, nan, nan, nan, nan)
+        nan = math.nan
+        return nan, nan, nan, nan, nan
 
+    # Términos compartidos: se calculan una vez y se reutilizan en precio y griegas
     sqrtT = math.sqrt(T)
-    d1 = (math.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / (sigma * sqrtT)
-    d2 = d1 - sigma * sqrtT
-
-    Nd1 = norm_cdf(d1)
-    Nd2 = norm_cdf(d2)
-    n_d1 = norm_pdf(d1)
+    sig_sqrtT = sigma * sqrtT
+    d1 = (math.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / sig_sqrtT
+    d2 = d1 - sig_sqrtT
 
     disc_r = math.exp(-r * T)
     disc_q = math.exp(-q * T)
+    dq_n_d1 = disc_q * _norm_pdf_nb(d1)
+    theta_vol = -dq_n_d1 * S * sigma / (2 * sqrtT)
 
-    if opt_type == "C":
+    # Solo las dos CDF que necesita cada tipo
+    if is_call:
+        Nd1 = _norm_cdf_nb(d1)
+        Nd2 = _norm_cdf_nb(d2)
         price = disc_q * S * Nd1 - disc_r * K * Nd2
         delta = disc_q * Nd1
-        theta_year = (-disc_q * (S * n_d1 * sigma) / (2 * sqrtT)
-                      - r * disc_r * K * Nd2
-                      + q * disc_q * S * Nd1)
+        theta_year = theta_vol - r * disc_r * K * Nd2 + q * disc_q * S * Nd1
     else:
-        Nmd1 = norm_cdf(-d1)
-        Nmd2 = norm_cdf(-d2)
+        Nmd1 = _norm_cdf_nb(-d1)
+        Nmd2 = _norm_cdf_nb(-d2)
         price = disc_r * K * Nmd2 - disc_q * S * Nmd1
         delta = -disc_q * Nmd1
-        theta_year = (-disc_q * (S * n_d1 * sigma) / (2 * sqrtT)
-                      + r * disc_r * K * Nmd2
-                      - q * disc_q * S * Nmd1)
+        theta_year = theta_vol + r * disc_r * K * Nmd2 - q * disc_q * S * Nmd1
 
-    gamma = disc_q * n_d1 / (S * sigma * sqrtT)
+    gamma = dq_n_d1 / (S * sig_sqrtT)
 
     # Vega "por 1.0" de vol (100 puntos) -> vega_1pct = /100
-    vega = disc_q * S * n_d1 * sqrtT
+    vega = dq_n_d1 * S * sqrtT
     vega_1pct = vega / 100.0
 
-    theta_day = theta_year / float(days_in_year)
+    theta_day = theta_year / days_in_year
+
+    return price, delta, gamma, vega_1pct, theta_day
+
+
+@njit(cache=True, fastmath=NUMBA_FASTMATH, error_model="numpy")
+def _straddle_kernel(
+    S: float,
+    K: float,
+    T: float,
+    r: float,
+    sigma: float,
+    q: float,
+    days_in_year: float
+) -> Tuple[float, float, float, float, float, float, float]:
+    """
+    Núcleo escalar (Numba) de straddle_greeks: call y put en una sola evaluación.
+    sqrt(T), d1/d2, descuentos y n(d1) se calculan una vez para las dos patas.
+    Devuelve (price, delta, gamma, vega_1pct, theta_day, call, put); NaN si inputs inválidos.
+    """
+    if S <= 0 or K <= 0 or T <= 0 or sigma <= 0:
+        nan = math.nan
+        return nan, nan, nan, nan, nan, nan, nan
+
+    sqrtT = math.sqrt(T)
+    sig_sqrtT = sigma * sqrtT
+    d1 = (math.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / sig_sqrtT
+    d2 = d1 - sig_sqrtT
+
+    disc_r = math.exp(-r * T)
+    disc_q = math.exp(-q * T)
+    dq_n_d1 = disc_q * _norm_pdf_nb(d1)
+    theta_vol = -dq_n_d1 * S * sigma / (2 * sqrtT)
+
+    # N(d) y N(-d) por separado (no 1 - N(d) ni paridad): sin cancelación en las colas
+    Nd1 = _norm_cdf_nb(d1)
+    Nd2 = _norm_cdf_nb(d2)
+    Nmd1 = _norm_cdf_nb(-d1)
+    Nmd2 = _norm_cdf_nb(-d2)
+
+    call = disc_q * S * Nd1 - disc_r * K * Nd2
+    put = disc_r * K * Nmd2 - disc_q * S * Nmd1
+    delta = disc_q * Nd1 - disc_q * Nmd1
+    theta_call_year = theta_vol - r * disc_r * K * Nd2 + q * disc_q * S * Nd1
+    theta_put_year = theta_vol + r * disc_r * K * Nmd2 - q * disc_q * S * Nmd1
+    theta_day = theta_call_year / days_in_year + theta_put_year / days_in_year
+
+    # gamma y vega son iguales para call y put -> x2
+    gamma = 2.0 * (dq_n_d1 / (S * sig_sqrtT))
+    vega_1pct = 2.0 * (dq_n_d1 * S * sqrtT / 100.0)
+
+    return call + put, delta, gamma, vega_1pct, theta_day, call, put
+
+
+# Build AOT opcional (python -m src._bs_aot): evita compilar _bs_kernel/_straddle_kernel en frío.
+# El build deja junto al .so un hash de las fuentes de las que sale (AOT_SOURCES); si no coincide
+# con las actuales (kernels editados sin regenerar) se ignora el .so y se usa el JIT.
+_SRC_DIR = Path(__file__).resolve().parent
+AOT_SOURCES = ("pricing.py", "utils.py", "_bs_aot.py")
+AOT_HASH_FILE = _SRC_DIR / "bs_aot.hash"
+
+
+def aot_source_hash() -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for name in AOT_SOURCES:
+        h.update((_SRC_DIR / name).read_bytes())
+    return h.hexdigest()
+
+
+def _load_scalar_kernels():
+    try:
+        fresh = AOT_HASH_FILE.read_text(encoding="utf-8").strip() == aot_source_hash()
+    except OSError:
+        fresh = False
+    if fresh:
+        try:
+            from src.bs_aot import bs_kernel, straddle_kernel
+            return bs_kernel, straddle_kernel
+        except ImportError:
+            pass
+    return _bs_kernel, _straddle_kernel
+
+
+_bs_scalar, _straddle_scalar = _load_scalar_kernels()
+
+
+# Memoización con inputs cuantizados (opt-in): S/K al céntimo, T al día, sigma a 1e-4, r/q a 1e-6.
+# Sube el hit rate en bucles de cobertura (barras adyacentes casi iguales) a costa de
+# un error de redondeo en el precio; por defecto desactivado -> inputs exactos.
+# Solo afecta al pricing escalar suelto (bs_price_greeks, straddle_greeks, price_straddle_combo).
+# Las rutas vectorizadas/Monte-Carlo (bs_price_vec, straddle_greeks_vec, legging en execution)
+# valoran siempre exacto: cuantizar S2 al céntimo borraría el movimiento de unos segundos.
+BS_QUANTIZE = False
+
+
+@lru_cache(maxsize=4096)
+def _bs_cached(
+    S: float, K: float, T: float, r: float, sigma: float, is_call: bool, q: float, days_in_year: float
+) -> Tuple[float, float, float, float, float]:
+    # Función pura: mismos inputs (p.ej. el straddle base de varios escenarios) -> una sola evaluación
+    return _bs_scalar(S, K, T, r, sigma, is_call, q, days_in_year)
+
+
+def _bs_inputs(
+    S: float, K: float, T: float, r: float, sigma: float, q: float, days_in_year: float
+) -> Tuple[float, float, float, float, float, float, float]:
+    # Clave de caché: floats Python, cuantizados si BS_QUANTIZE
+    S, K, T, r, sigma, q, days_in_year = float(S), float(K), float(T), float(r), float(sigma), float(q), float(days_in_year)
+    if BS_QUANTIZE:
+        S, K, r, sigma, q = round(S, 2), round(K, 2), round(r, 6), round(sigma, 4), round(q, 6)
+        # T al día; un T positivo no se redondea a 0 (cambiaría a payoff/NaN)
+        if T > 0:
+            T = max(round(T * days_in_year), 1) / days_in_year
+    return S, K, T, r, sigma, q, days_in_year
+
+
+def _bs_lookup(
+    S: float, K: float, T: float, r: float, sigma: float, is_call: bool, q: float, days_in_year: float
+) -> Tuple[float, float, float, float, float]:
+    S, K, T, r, sigma, q, days_in_year = _bs_inputs(S, K, T, r, sigma, q, days_in_year)
+    return _bs_cached(S, K, T, r, sigma, is_call, q, days_in_year)
+
+
+@lru_cache(maxsize=4096)
+def _straddle_cached(
+    S: float, K: float, T: float, r: float, sigma: float, q: float, days_in_year: float
+) -> Tuple[float, float, float, float, float, float, float]:
+    return _straddle_scalar(S, K, T, r, sigma, q, days_in_year)
+
+
+def _straddle_prices(
+    S: float, K: float, T: float, r: float, sigma: float, q: float = 0.0, exact: bool = False
+) -> Tuple[float, float]:
+    """
+    (call, put) con una sola evaluación del straddle. Comparte la caché de straddle_greeks.
+    exact=True: inputs sin cuantizar aunque BS_QUANTIZE (p.ej. pata 1 del legging,
+    para valorar con el mismo convenio que la pata 2).
+    """
+    if exact:
+        out = _straddle_cached(float(S), float(K), float(T), float(r), float(sigma), float(q), 365.0)
+    else:
+        out = _straddle_cached(*_bs_inputs(S, K, T, r, sigma, q, 365.0))
+    return float(out[5]), float(out[6])
+
+
+def bs_price_greeks(
+    S: float,
+    K: float,
+    T: float,               # años
+    r: float,
+    sigma: float,
+    opt_type: OptionType,
+    q: float = 0.0,
+    days_in_year: int = 365
+) -> BSGreeks:
+    """
+    Black-Scholes europea con dividend yield q.
+
+    Devuelve:
+    - vega_1pct: por +1 punto de vol (p.ej. 20%->21%)
+    - theta_day: por día (dividiendo la theta anual entre days_in_year)
+
+    Nota: internamente se calcula la theta "por año" (porque T está en años),
+    y luego se convierte a diaria. El cálculo va en _bs_kernel (Numba, o su build AOT),
+    memoizado por inputs (lru_cache; cuantizados si BS_QUANTIZE).
+    """
+    price, delta, gamma, vega_1pct, theta_day = _bs_lookup(S, K, T, r, sigma, opt_type == "C", q, days_in_year)
 
     return BSGreeks(
         price=float(price),
@@ -116,6 +300,96 @@ def bs_price_greeks(
     )
 
 
+def bs_price_vec(
+    S,
+    K,
+    T,
+    r: float,
+    sigma,
+    opt_type: OptionType,
+    q: float = 0.0
+) -> np.ndarray:
+    """
+    Precio Black-Scholes vectorizado (broadcasting NumPy) sobre arrays de S/K/T/sigma.
+    Mismo convenio que bs_price_greeks: NaN si S, K, T o sigma <= 0.
+    """
+    S = np.asarray(S, dtype=float)
+    K = np.asarray(K, dtype=float)
+    T = np.asarray(T, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sig_sqrtT = sigma * np.sqrt(T)
+        d1 = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / sig_sqrtT
+        d2 = d1 - sig_sqrtT
+
+        disc_r = np.exp(-r * T)
+        disc_q = np.exp(-q * T)
+
+        if opt_type == "C":
+            price = disc_q * S * ndtr(d1) - disc_r * K * ndtr(d2)
+        else:
+            price = disc_r * K * ndtr(-d2) - disc_q * S * ndtr(-d1)
+
+    valid = (S > 0) & (K > 0) & (T > 0) & (sigma > 0)
+    return np.where(valid, price, np.nan)
+
+
+def bs_greeks_vec(
+    S,
+    K,
+    T,
+    r: float,
+    sigma,
+    sign,
+    q: float = 0.0,
+    days_in_year: int = 365
+) -> Dict[str, np.ndarray]:
+    """
+    Precio + griegas BS vectorizadas (mismas unidades que bs_price_greeks).
+    sign: +1 call / -1 put (array o escalar), así calls y puts van en la misma pasada.
+    """
+    S = np.asarray(S, dtype=float)
+    K = np.asarray(K, dtype=float)
+    T = np.asarray(T, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    phi = np.asarray(sign, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Mismos términos compartidos que _bs_kernel: cada temporal de array se calcula una vez
+        sqrtT = np.sqrt(T)
+        sig_sqrtT = sigma * sqrtT
+        d1 = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / sig_sqrtT
+        d2 = d1 - sig_sqrtT
+
+        N_phi_d1 = ndtr(phi * d1)
+        N_phi_d2 = ndtr(phi * d2)
+
+        disc_r = np.exp(-r * T)
+        disc_q = np.exp(-q * T)
+        dq_n_d1 = disc_q * _INV_SQRT_2PI * np.exp(-0.5 * d1 * d1)
+        dq_S_N_d1 = disc_q * S * N_phi_d1
+        dr_K_N_d2 = disc_r * K * N_phi_d2
+
+        price = phi * (dq_S_N_d1 - dr_K_N_d2)
+        delta = phi * disc_q * N_phi_d1
+        theta_year = (-dq_n_d1 * S * sigma / (2 * sqrtT)
+                      - phi * r * dr_K_N_d2
+                      + phi * q * dq_S_N_d1)
+        gamma = dq_n_d1 / (S * sig_sqrtT)
+        vega = dq_n_d1 * S * sqrtT
+
+    valid = (S > 0) & (K > 0) & (T > 0) & (sigma > 0)
+    nan = np.nan
+    return {
+        "price": np.where(valid, price, nan),
+        "delta": np.where(valid, delta, nan),
+        "gamma": np.where(valid, gamma, nan),
+        "vega_1pct": np.where(valid, vega / 100.0, nan),
+        "theta_day": np.where(valid, theta_year / float(days_in_year), nan),
+    }
+
+
 def straddle_greeks(
     S: float,
     K: float,
@@ -131,19 +405,83 @@ def straddle_greeks(
     - vega_1pct
     - theta_day
     """
-    call = bs_price_greeks(S, K, T, r, sigma, "C", q=q, days_in_year=days_in_year)
-    put  = bs_price_greeks(S, K, T, r, sigma, "P", q=q, days_in_year=days_in_year)
+    # Una sola evaluación para las dos patas (_straddle_kernel), memoizada como bs_price_greeks
+    price, delta, gamma, vega_1pct, theta_day, call, put = _straddle_cached(
+        *_bs_inputs(S, K, T, r, sigma, q, days_in_year)
+    )
 
     return {
-        "price": call.price + put.price,
-        "delta": call.delta + put.delta,
-        "gamma": call.gamma + put.gamma,
-        "vega_1pct": call.vega_1pct + put.vega_1pct,
-        "theta_day": call.theta_day + put.theta_day,
-        "call_price": call.price,
-        "put_price": put.price,
+        "price": float(price),
+        "delta": float(delta),
+        "gamma": float(gamma),
+        "vega_1pct": float(vega_1pct),
+        "theta_day": float(theta_day),
+        "call_price": float(call),
+        "put_price": float(put),
     }
 
+
+def straddle_greeks_vec(
+    S,
+    K,
+    T,
+    r: float,
+    sigma,
+    q: float = 0.0,
+    days_in_year: int = 365
+) -> Dict[str, np.ndarray]:
+    """
+    straddle_greeks vectorizada sobre arrays alineados de S/K/T/sigma (p.ej. toda la serie diaria).
+    Call y put comparten d1/d2, descuentos y n(d1): se calculan una vez por fila
+    y las griegas del straddle salen sumadas directamente (ndtr de scipy para N(.)).
+    """
+    S = np.asarray(S, dtype=float)
+    K = np.asarray(K, dtype=float)
+    T = np.asarray(T, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sqrtT = np.sqrt(T)
+        sig_sqrtT = sigma * sqrtT
+        d1 = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / sig_sqrtT
+        d2 = d1 - sig_sqrtT
+
+        disc_r = np.exp(-r * T)
+        disc_q = np.exp(-q * T)
+        dq_n_d1 = disc_q * _INV_SQRT_2PI * np.exp(-0.5 * d1 * d1)
+
+        # N(d) y N(-d) por separado (no 1 - N(d)) para no perder precisión en las colas
+        Nd1 = ndtr(d1)
+        Nmd1 = ndtr(-d1)
+        dq_S_Nd1 = disc_q * S * Nd1
+        dq_S_Nmd1 = disc_q * S * Nmd1
+        dr_K_Nd2 = disc_r * K * ndtr(d2)
+        dr_K_Nmd2 = disc_r * K * ndtr(-d2)
+
+        call_price = dq_S_Nd1 - dr_K_Nd2
+        put_price = dr_K_Nmd2 - dq_S_Nmd1
+        delta = disc_q * (Nd1 - Nmd1)
+        gamma = 2.0 * dq_n_d1 / (S * sig_sqrtT)
+        vega = 2.0 * dq_n_d1 * S * sqrtT
+        theta_year = (-dq_n_d1 * S * sigma / sqrtT
+                      - r * (dr_K_Nd2 - dr_K_Nmd2)
+                      + q * (dq_S_Nd1 - dq_S_Nmd1))
+
+    valid = (S > 0) & (K > 0) & (T > 0) & (sigma > 0)
+    nan = np.nan
+    call_price = np.where(valid, call_price, nan)
+    put_price = np.where(valid, put_price, nan)
+    return {
+        "price": call_price + put_price,
+        "delta": np.where(valid, delta, nan),
+        "gamma": np.where(valid, gamma, nan),
+        "vega_1pct": np.where(valid, vega / 100.0, nan),
+        "theta_day": np.where(valid, theta_year / float(days_in_year), nan),
+        "call_price": call_price,
+        "put_price": put_price,
+    }
+
+
 def sigma_proxy_hv_vix(
     df_spy: pd.DataFrame,
     df_vix: pd.DataFrame,
@@ -166,28 +504,46 @@ def sigma_proxy_hv_vix(
     if "datetime" not in df_vix.columns or "vix_close" not in df_vix.columns:
         raise ValueError("df_vix necesita columnas: datetime, vix_close")
 
-    spy = df_spy.copy()
-    spy["datetime"] = pd.to_datetime(spy["datetime"]).dt.tz_localize(None)
-    spy = spy.sort_values("datetime").set_index("datetime")
+    # Arrays ordenados por fecha (sin copias del DataFrame ni set_index)
+    spy_dt = naive_datetime(df_spy["datetime"]).to_numpy()
+    close = df_spy["close"].to_numpy()
+    if not (spy_dt[1:] >= spy_dt[:-1]).all():
+        order = np.argsort(spy_dt, kind="stable")
+        spy_dt, close = spy_dt[order], close[order]
 
-    vix = df_vix.copy()
-    vix["datetime"] = pd.to_datetime(vix["datetime"]).dt.tz_localize(None)
-    vix = vix.sort_values("datetime").set_index("datetime")
+    vix_dt = naive_datetime(df_vix["datetime"]).to_numpy()
+    vix_close = df_vix["vix_close"].to_numpy(dtype=np.float64)
+    if not (vix_dt[1:] >= vix_dt[:-1]).all():
+        order = np.argsort(vix_dt, kind="stable")
+        vix_dt, vix_close = vix_dt[order], vix_close[order]
 
     # HV anualizada
-    hv = hist_vol_close(spy["close"], window=hv_window, annualization=hv_annualization)
-    spy["hv"] = hv
+    hv = hist_vol_close(pd.Series(close), window=hv_window, annualization=hv_annualization).to_numpy()
+
+    # VIX alineado a las fechas de SPY (= reindex + ffill): coincidencia exacta de fecha
+    # por searchsorted y, si falta, el último valor disponible en una fila anterior
+    spy_ns = spy_dt.astype("datetime64[ns]")
+    vix_ns = vix_dt.astype("datetime64[ns]")
+    pos = np.searchsorted(vix_ns, spy_ns)
+    pos_c = np.minimum(pos, max(len(vix_ns) - 1, 0))
+    vix = np.full(len(spy_ns), np.nan)
+    if len(vix_ns):
+        hit = (pos < len(vix_ns)) & (vix_ns[pos_c] == spy_ns)
+        vix[hit] = vix_close[pos_c[hit]]
+    # ffill: índice de la última fila con valor
+    last = np.where(np.isnan(vix), 0, np.arange(len(vix)))
+    np.maximum.accumulate(last, out=last)
+    vix = vix[last]
 
     # VIX -> sigma
     # VIX close suele venir en puntos (ej 18.5) => 0.185
-    spy["vix"] = vix["vix_close"].reindex(spy.index).ffill()
-    spy["sigma_vix"] = spy["vix"] / 100.0
+    sigma_vix = vix / 100.0
 
     # Mezcla
     w = float(vix_weight)
-    spy["sigma_proxy"] = w * spy["sigma_vix"] + (1.0 - w) * spy["hv"]
+    sigma_proxy = w * sigma_vix + (1.0 - w) * hv
 
     # Limpieza (floor/cap para evitar valores raros o NaNs al inicio)
-    spy["sigma_proxy"] = spy["sigma_proxy"].clip(lower=sigma_floor, upper=sigma_cap)
+    sigma_proxy = np.clip(sigma_proxy, sigma_floor, sigma_cap)
 
-    return spy.reset_index()[["datetime", "close", "hv", "vix", "sigma_proxy"]]
+    return pd.DataFrame({"datetime": spy_dt, "close": close, "hv": hv, "vix": vix, "sigma_proxy": sigma_proxy})
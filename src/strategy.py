@@ -3,18 +3,21 @@
 
 from __future__ import annotations
 
-import math
 from dataclasses import dataclass
-from typing import Optional, Literal, Dict, Any, Tuple, List
+from typing import Literal, Dict, Any, Tuple, List
 
 import numpy as np
 import pandas as pd
+from numba import njit
 
-from src.pricing import bs_price_greeks, straddle_greeks, hist_vol_close
+from src.pricing import bs_price_greeks, straddle_greeks_vec, hist_vol_close
+from src.utils import NUMBA_FASTMATH, naive_datetime
 
 
 RollFreq = Literal["W", "M"]
 
+_NS_PER_DAY = 86_400_000_000_000
+
 
 # =========================
 # Config dataclasses (simple)
@@ -56,22 +59,27 @@ def _roll_dates(index: pd.DatetimeIndex, freq: RollFreq) -> pd.DatetimeIndex:
     Devuelve fechas de roll dentro de un índice diario.
     - M: primer día de cada mes presente en index
     - W: primer día de cada semana (lunes) presente en index
+
+    Sin groupby: periodo de cada fecha como int64 (to_period) y primera aparición
+    de cada periodo con np.unique sobre el índice ordenado.
     """
     idx = pd.DatetimeIndex(index).tz_localize(None)
 
     if freq == "M":
         # primer día disponible por mes
-        grp = pd.Series(idx).groupby([idx.year, idx.month]).min()
-        return pd.DatetimeIndex(grp.values)
+        period = "M"
     elif freq == "W":
-        # lunes de cada semana (o primer día disponible de esa semana)
-        # agrupamos por ISO year/week
-        iso = idx.isocalendar()
-        grp = pd.Series(idx).groupby([iso["year"].values, iso["week"].values]).min()
-        return pd.DatetimeIndex(grp.values)
+        # lunes de cada semana (o primer día disponible de esa semana):
+        # W-SUN = semanas lunes-domingo, las mismas que ISO year/week
+        period = "W-SUN"
     else:
         raise ValueError("roll_frequency debe ser 'W' o 'M'.")
 
+    if not idx.is_monotonic_increasing:
+        idx = idx.sort_values()
+    _, first = np.unique(idx.to_period(period).asi8, return_index=True)
+    return idx[first].rename(None)
+
 
 def _pick_expiry_date(roll_date: pd.Timestamp, target_days: int) -> pd.Timestamp:
     """
@@ -79,13 +87,10 @@ def _pick_expiry_date(roll_date: pd.Timestamp, target_days: int) -> pd.Timestamp
     roll_date + target_days.
     Luego, si cae en fin de semana, la movemos al viernes anterior.
     """
+    # Ajuste simple: si sábado/domingo -> viernes (sábado -1 día, domingo -2), sin bucle:
+    # un solo Timedelta con el desplazamiento total
     exp = roll_date + pd.Timedelta(days=int(target_days))
-
-    # Ajuste simple: si sábado/domingo -> viernes
-    while exp.weekday() >= 5:
-        exp = exp - pd.Timedelta(days=1)
-
-    return exp
+    return exp - pd.Timedelta(days=max(0, exp.weekday() - 4))
 
 
 def _round_to_step(x: float, step: float) -> float:
@@ -97,204 +102,364 @@ def _round_to_step(x: float, step: float) -> float:
 # =========================
 # Main strategy simulator
 # =========================
-def simulate_periodic_straddle(
-    df_spy: pd.DataFrame,
-    straddle: StraddleParams,
-    pricing: PricingParams,
-    hedge: HedgeParams,
-    initial_cash: float = 100000.0,
-    sigma_col: str = "sigma_proxy"
-) -> Tuple[pd.DataFrame, pd.DataFrame]:
+def _prepare_input(
+    df_spy: pd.DataFrame, pricing: PricingParams, sigma_col: str
+) -> Tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
     """
-    Simula:
-    - Long straddle periódico (roll W/M)
-    - (Opcional) delta-hedge con subyacente (shares) usando tus griegas BS.
-
-    Inputs:
-    - df_spy: DataFrame con columnas: ['datetime','close'] mínimo.
-    - straddle: parámetros de roll y tamaño.
-    - pricing: parámetros de vol y BS.
-    - hedge: reglas de hedge.
-    - initial_cash: cash inicial.
-
-    Outputs:
-    - daily: MTM diario, greeks, hedge, equity
-    - trades: eventos de roll y hedge (simulados)
+    Índice datetime naive ordenado + arrays close/sigma alineados.
+    Solo se leen las columnas necesarias (sin copiar df_spy entero); se reordena por posición
+    únicamente si las fechas no vienen ya ordenadas.
     """
     if "datetime" not in df_spy.columns or "close" not in df_spy.columns:
         raise ValueError("df_spy debe tener columnas: datetime, close")
 
-    df = df_spy.copy()
-    df["datetime"] = pd.to_datetime(df["datetime"]).dt.tz_localize(None)
-    df = df.sort_values("datetime").reset_index(drop=True)
-    df = df.set_index("datetime")
-    idx = df.index
+    dt = naive_datetime(df_spy["datetime"]).to_numpy()
+    close = df_spy["close"].to_numpy()
+    sigma = df_spy[sigma_col].to_numpy(dtype=np.float64) if sigma_col in df_spy.columns else None
 
-    # sigma histórica rolling (anualizada)
+    idx = pd.DatetimeIndex(dt, name="datetime")
+    if not idx.is_monotonic_increasing:
+        order = idx.argsort(kind="stable")
+        idx = idx[order]
+        close = close[order]
+        if sigma is not None:
+            sigma = sigma[order]
 
-    if sigma_col in df.columns:
-        df["sigma"] = df[sigma_col].astype(float)
-    else:
-        df["sigma"] = hist_vol_close(df["close"], window=pricing.vol_window, annualization=pricing.vol_annualization)
+    # sigma histórica rolling (anualizada)
+    if sigma is None:
+        sigma = hist_vol_close(
+            pd.Series(close, index=idx), window=pricing.vol_window, annualization=pricing.vol_annualization
+        ).to_numpy(dtype=np.float64)
 
+    return idx, np.asarray(close, dtype=np.float64), sigma
 
-    # fechas de roll
-    roll_dates = set(_roll_dates(idx, straddle.roll_frequency))
 
-    # Estado de la “posición actual”
-    current_K: Optional[float] = None
-    current_expiry: Optional[pd.Timestamp] = None
-    in_position: bool = False
+def _price_straddle_path(
+    idx: pd.DatetimeIndex,
+    close: np.ndarray,
+    sigma_arr: np.ndarray,
+    straddle: StraddleParams,
+    pricing: PricingParams
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Rolls, flujos de caja de las opciones, MTM y griegas de todo el índice.
+    Nada de esto depende del hedge, así que se reutiliza para varias HedgeParams.
+
+    Dos fases:
+    1) calendario de rolls (roll_points) y su K/expiry, saltando de un roll al siguiente;
+       K y expiry diarios salen de esos rolls por forward-fill con índices enteros;
+    2) valoración BS vectorizada (straddle_greeks_vec) de toda la serie de una vez,
+       más los cierres de roll con su K/expiry anteriores.
+
+    Devuelve:
+    - path: columnas diarias (arrays alineados con idx)
+    - roll_trades: eventos ROLL_CLOSE / ROLL_OPEN
+    """
+    n = len(idx)
 
-    # Hedge (shares del subyacente)
-    shares = 0.0
+    # fechas de roll como posiciones en idx; fechas en int64 (ns) para comparar sin Timestamps
+    idx_ns = idx.values.astype("datetime64[ns]").view(np.int64)
+    roll_ns = _roll_dates(idx, straddle.roll_frequency).values.astype("datetime64[ns]").view(np.int64)
+    roll_pos = np.flatnonzero(np.isin(idx_ns, roll_ns))
 
-    # Cash/equity tracking
-    cash = float(initial_cash)
-
-    # Logs
-    daily_rows: List[Dict[str, Any]] = []
-    trades_rows: List[Dict[str, Any]] = []
+    # Posición en idx de cada roll, con el strike y la expiración que abre
+    roll_rows: List[int] = []
+    roll_K: List[float] = []
+    roll_expiry: List[pd.Timestamp] = []
 
     # Helpers: pricing multipliers
     contracts = float(straddle.contracts)
     mult = float(straddle.multiplier)
-
-    for t in idx:
-        S = float(df.loc[t, "close"])
-        sigma = float(df.loc[t, "sigma"]) if math.isfinite(float(df.loc[t, "sigma"])) else float("nan")
-        r = float(pricing.risk_free_rate)
-        q = float(pricing.dividend_yield)
-
-        # 1) Si toca roll (o aún no estamos posicionados), abrimos nuevo straddle
-        if (t in roll_dates) or (not in_position) or (current_expiry is not None and t >= current_expiry):
-            # Cerrar posición anterior (si existe) al precio teórico del día t
-            if in_position and current_K is not None and current_expiry is not None:
-                T_old = max((current_expiry - t).days / pricing.days_in_year, 1e-9)
-
-                if math.isfinite(sigma):
-                    old = straddle_greeks(S, current_K, T_old, r, sigma, q=q, days_in_year=pricing.days_in_year)
-                    opt_value_old = old["price"] * contracts * mult
-                else:
-                    opt_value_old = float("nan")
-
-                # En este backtest teórico: cerramos a valor teórico -> cash aumenta por valor de la posición
-                if math.isfinite(opt_value_old):
-                    cash += opt_value_old
-
-                trades_rows.append({
-                    "datetime": t,
-                    "type": "ROLL_CLOSE",
-                    "K": current_K,
-                    "expiry": current_expiry,
-                    "contracts": contracts,
-                    "option_value": opt_value_old
-                })
-
-            # Abrir nuevo straddle
-            current_expiry = _pick_expiry_date(t, straddle.expiry_target_days)
-            current_K = _round_to_step(S, straddle.strike_round)
-            in_position = True
-
-            # Coste de abrir (pagas prima teórica)
-            if math.isfinite(sigma):
-                T_new = max((current_expiry - t).days / pricing.days_in_year, 1e-9)
-                new = straddle_greeks(S, current_K, T_new, r, sigma, q=q, days_in_year=pricing.days_in_year)
-                opt_value_new = new["price"] * contracts * mult
-            else:
-                opt_value_new = float("nan")
-
-            if math.isfinite(opt_value_new):
-                cash -= opt_value_new
-
-            trades_rows.append({
+    r = float(pricing.risk_free_rate)
+    q = float(pricing.dividend_yield)
+    cmult = contracts * mult
+    inv_days = 1.0 / pricing.days_in_year
+
+    # -------------------------
+    # 1) Rolls (sin pricing)
+    # -------------------------
+    # Entre rolls K/expiry no cambian: se salta de roll en roll (idx ordenado, como sale de
+    # _prepare_input). El siguiente roll es la primera fecha de roll posterior o el primer
+    # día con t >= expiry, lo que llegue antes (como mínimo el día siguiente).
+    i = 0
+    while i < n:
+        # se cierra el anterior (si existe) y se abre nuevo straddle
+        expiry = _pick_expiry_date(idx[i], straddle.expiry_target_days)
+        roll_rows.append(i)
+        roll_K.append(_round_to_step(float(close[i]), straddle.strike_round))
+        roll_expiry.append(expiry)
+
+        k = int(np.searchsorted(roll_pos, i, side="right"))
+        next_roll = int(roll_pos[k]) if k < roll_pos.size else n
+        next_expiry = max(int(np.searchsorted(idx_ns, expiry.value, side="left")), i + 1)
+        i = min(next_roll, next_expiry)
+
+    roll_points = np.asarray(roll_rows, dtype=np.intp)
+    K_roll = np.asarray(roll_K, dtype=np.float64)
+    expiry_roll = pd.DatetimeIndex(roll_expiry)
+
+    # Tramo vigente de cada día (forward-fill del último roll)
+    is_roll = np.zeros(n, dtype=bool)
+    is_roll[roll_points] = True
+    seg = np.cumsum(is_roll) - 1
+
+    # -------------------------
+    # 2) Valoración vectorizada (arrays float64 contiguos alineados con idx)
+    # -------------------------
+    # Días hasta expiración con enteros (ns // día, como Timedelta.days), sin TimedeltaIndex
+    expiry_roll_ns = expiry_roll.values.astype("datetime64[ns]").view(np.int64)
+
+    def _T_years(expiries_ns: np.ndarray, dates_ns: np.ndarray) -> np.ndarray:
+        days = ((expiries_ns - dates_ns) // _NS_PER_DAY).astype(np.float64)
+        return np.maximum(days * inv_days, 1e-9)
+
+    S = np.ascontiguousarray(close, dtype=np.float64)
+    sigma = np.asarray(sigma_arr, dtype=np.float64)
+    sigma = np.where(np.isfinite(sigma), sigma, np.nan)
+    ok = np.isfinite(sigma)
+
+    K = K_roll[seg]
+    expiry = expiry_roll[seg]
+    T = _T_years(expiry_roll_ns[seg], idx_ns)
+    st = straddle_greeks_vec(S, K, T, r, sigma, q=q, days_in_year=pricing.days_in_year)
+
+    # Mark-to-market del straddle actual; opt_price por 1 straddle (call+put) y 1x.
+    # Griegas cartera (en unidades por 1 subyacente): delta de una opción es por 1 acción -> *contracts*mult
+    opt_price = np.where(ok, st["price"], np.nan)
+    opt_value = np.where(ok, st["price"] * cmult, 0.0)
+    port = {k: np.where(ok, st[k] * cmult, 0.0) for k in ("delta", "gamma", "vega_1pct", "theta_day")}
+
+    # Apertura: mismo S/K/T/sigma que el MTM del día -> se reutiliza su valor (pagas prima teórica)
+    opens = roll_points
+    open_value = np.where(ok[opens], st["price"][opens] * cmult, np.nan)
+
+    # Cierre: en cada roll salvo el primero, K/expiry del tramo anterior valorados en el día t
+    # (en este backtest teórico se cierra a valor teórico)
+    closes = roll_points[1:]
+    if closes.size:
+        old = straddle_greeks_vec(
+            S[closes], K_roll[:-1], _T_years(expiry_roll_ns[:-1], idx_ns[closes]),
+            r, sigma[closes], q=q, days_in_year=pricing.days_in_year
+        )
+        close_value = np.where(ok[closes], old["price"] * cmult, np.nan)
+    else:
+        close_value = np.empty(0)
+
+    cash_in_close = np.zeros(n)
+    cash_out_open = np.zeros(n)
+    cash_in_close[closes] = np.where(np.isfinite(close_value), close_value, 0.0)
+    cash_out_open[opens] = np.where(np.isfinite(open_value), open_value, 0.0)
+
+    # Eventos de roll: en cada roll, ROLL_CLOSE del tramo anterior y luego ROLL_OPEN del nuevo
+    roll_trades: List[Dict[str, Any]] = []
+    for j, i in enumerate(roll_rows):
+        t = idx[i]
+        if j > 0:
+            roll_trades.append({
                 "datetime": t,
-                "type": "ROLL_OPEN",
-                "K": current_K,
-                "expiry": current_expiry,
+                "type": "ROLL_CLOSE",
+                "K": roll_K[j - 1],
+                "expiry": roll_expiry[j - 1],
                 "contracts": contracts,
-                "option_value": opt_value_new
+                "option_value": float(close_value[j - 1])
             })
+        roll_trades.append({
+            "datetime": t,
+            "type": "ROLL_OPEN",
+            "K": roll_K[j],
+            "expiry": roll_expiry[j],
+            "contracts": contracts,
+            "option_value": float(open_value[j])
+        })
+        # Nota: no tocamos hedge aquí; se gestiona en _apply_hedge según delta
+
+    path: Dict[str, Any] = {
+        "S": S,
+        "sigma": sigma,
+        "K": K,
+        "expiry": expiry,
+        "T_years": np.where(ok, T, np.nan),
+        "opt_price_straddle": opt_price,
+        "opt_value": opt_value,
+        "delta_opt": port["delta"],
+        "gamma_opt": port["gamma"],
+        "vega_1pct_opt": port["vega_1pct"],
+        "theta_day_opt": port["theta_day"],
+        "cash_in_close": cash_in_close,
+        "cash_out_open": cash_out_open,
+    }
+    return path, roll_trades
+
+
+@njit(cache=True, fastmath=NUMBA_FASTMATH)
+def _hedge_kernel(
+    S: np.ndarray, port_delta: np.ndarray, opt_value: np.ndarray,
+    cash_in_close: np.ndarray, cash_out_open: np.ndarray,
+    enabled: bool, target_delta: float, rebalance_threshold: float, initial_cash: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bucle diario de hedge/cash/equity (Numba).
+    Devuelve shares, cash, equity por día, más traded (bool) y shares_trade de cada día
+    (cash tras el trade = cash[i], shares_pos = shares[i]).
+    """
+    n = S.shape[0]
+    shares_col = np.empty(n)
+    cash_col = np.empty(n)
+    equity_col = np.empty(n)
+    traded = np.zeros(n, dtype=np.bool_)
+    trade_col = np.zeros(n)
+
+    # Hedge (shares del subyacente)
+    shares = 0.0
 
-            # Nota: no tocamos hedge aquí; se gestiona abajo según delta
-
-        # 2) Mark-to-market del straddle actual
-        if in_position and current_K is not None and current_expiry is not None and math.isfinite(sigma):
-            T = max((current_expiry - t).days / pricing.days_in_year, 1e-9)
-            st = straddle_greeks(S, current_K, T, r, sigma, q=q, days_in_year=pricing.days_in_year)
-            opt_price = st["price"]                 # por 1 straddle (call+put) y 1x
-            opt_value = opt_price * contracts * mult
-
-            # Greeks cartera (en unidades por 1 subyacente)
-            # Delta de una opción es por 1 acción; para cartera: *contracts*mult
-            port_delta = st["delta"] * contracts * mult
-            port_gamma = st["gamma"] * contracts * mult
-            port_vega_1pct = st["vega_1pct"] * contracts * mult
-            port_theta_day = st["theta_day"] * contracts * mult
-
-        else:
-            T = float("nan")
-            opt_price = float("nan")
-            opt_value = 0.0
-            port_delta = 0.0
-            port_gamma = 0.0
-            port_vega_1pct = 0.0
-            port_theta_day = 0.0
+    # Cash/equity tracking
+    cash = initial_cash
+
+    for i in range(n):
+        # 1) Flujos de caja del roll (mismo orden que al valorar: cierre y luego apertura)
+        cash += cash_in_close[i]
+        cash -= cash_out_open[i]
 
         # 3) Delta hedge con subyacente (si enabled)
-        hedge_trade = 0.0
-        if hedge.enabled and in_position and math.isfinite(port_delta):
+        if enabled and np.isfinite(port_delta[i]):
             # Delta total incluyendo el hedge actual en acciones
-            total_delta = port_delta + shares  # porque 1 share = delta 1
+            total_delta = port_delta[i] + shares  # porque 1 share = delta 1
 
-            if abs(total_delta - hedge.target_delta) > hedge.rebalance_threshold:
+            if abs(total_delta - target_delta) > rebalance_threshold:
                 # Ajustamos shares para acercarnos al target
-                desired_shares = hedge.target_delta - port_delta
+                desired_shares = target_delta - port_delta[i]
                 hedge_trade = desired_shares - shares  # compra(+)/venta(-)
 
                 # Ejecutamos a precio S (sin slippage/fees aquí; eso irá en execution.py)
-                cash -= hedge_trade * S
+                cash -= hedge_trade * S[i]
                 shares = desired_shares
 
-                trades_rows.append({
-                    "datetime": t,
-                    "type": "HEDGE_TRADE",
-                    "shares_trade": hedge_trade,
-                    "shares_pos": shares,
-                    "price": S,
-                    "cash_after": cash
-                })
+                traded[i] = True
+                trade_col[i] = hedge_trade
 
         # 4) Equity (cash + MTM opciones + MTM hedge)
-        equity = cash + opt_value + shares * S
+        shares_col[i] = shares
+        cash_col[i] = cash
+        equity_col[i] = cash + opt_value[i] + shares * S[i]
+
+    return shares_col, cash_col, equity_col, traded, trade_col
 
-        daily_rows.append({
+
+def _apply_hedge(
+    idx: pd.DatetimeIndex,
+    path: Dict[str, Any],
+    roll_trades: List[Dict[str, Any]],
+    hedge: HedgeParams,
+    contracts: float,
+    initial_cash: float
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Aplica una HedgeParams sobre un path ya valorado: hedge, cash y equity (bucle en _hedge_kernel).
+    """
+    S = path["S"]
+    shares_col, cash_col, equity_col, traded, trade_col = _hedge_kernel(
+        S, path["delta_opt"], path["opt_value"],
+        path["cash_in_close"], path["cash_out_open"],
+        bool(hedge.enabled), float(hedge.target_delta), float(hedge.rebalance_threshold), float(initial_cash)
+    )
+
+    rows = np.flatnonzero(traded)
+    hedge_trades: List[Dict[str, Any]] = [
+        {
             "datetime": t,
-            "S": S,
-            "sigma": sigma,
-            "K": current_K,
-            "expiry": current_expiry,
-            "T_years": T,
-            "contracts": contracts,
-            "shares": shares,
+            "type": "HEDGE_TRADE",
+            "shares_trade": tr,
+            "shares_pos": sh,
+            "price": px,
+            "cash_after": c
+        }
+        for t, tr, sh, px, c in zip(
+            idx[rows], trade_col[rows].tolist(), shares_col[rows].tolist(),
+            S[rows].tolist(), cash_col[rows].tolist()
+        )
+    ]
+
+    daily = pd.DataFrame({
+        "S": path["S"],
+        "sigma": path["sigma"],
+        "K": path["K"],
+        "expiry": path["expiry"],
+        "T_years": path["T_years"],
+        "contracts": contracts,
+        "shares": shares_col,
+
+        "opt_price_straddle": path["opt_price_straddle"],
+        "opt_value": path["opt_value"],
+
+        "delta_opt": path["delta_opt"],
+        "gamma_opt": path["gamma_opt"],
+        "vega_1pct_opt": path["vega_1pct_opt"],
+        "theta_day_opt": path["theta_day_opt"],
+
+        "cash": cash_col,
+        "equity": equity_col,
+    }, index=idx)
+
+    # Rolls antes que hedges del mismo día (sort estable)
+    trades = pd.DataFrame(roll_trades + hedge_trades)
+    if not trades.empty:
+        trades["datetime"] = naive_datetime(trades["datetime"])
+        trades = trades.sort_values("datetime", kind="stable").reset_index(drop=True)
 
-            "opt_price_straddle": opt_price,
-            "opt_value": opt_value,
+    return daily, trades
 
-            "delta_opt": port_delta,
-            "gamma_opt": port_gamma,
-            "vega_1pct_opt": port_vega_1pct,
-            "theta_day_opt": port_theta_day,
 
-            "cash": cash,
-            "equity": equity,
-        })
+def simulate_periodic_straddle_multi(
+    df_spy: pd.DataFrame,
+    straddle: StraddleParams,
+    pricing: PricingParams,
+    hedges: List[HedgeParams],
+    initial_cash: float = 100000.0,
+    sigma_col: str = "sigma_proxy"
+) -> List[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """
+    Igual que simulate_periodic_straddle pero para varias reglas de hedge:
+    el straddle (rolls, precios, griegas) se valora una sola vez y solo
+    el paso de hedge se repite por cada HedgeParams.
 
-    daily = pd.DataFrame(daily_rows).set_index("datetime")
-    trades = pd.DataFrame(trades_rows)
-    if not trades.empty:
-        trades["datetime"] = pd.to_datetime(trades["datetime"]).dt.tz_localize(None)
-        trades = trades.sort_values("datetime").reset_index(drop=True)
+    Devuelve una lista de (daily, trades), en el mismo orden que `hedges`.
+    """
+    idx, close, sigma = _prepare_input(df_spy, pricing, sigma_col)
+    path, roll_trades = _price_straddle_path(idx, close, sigma, straddle, pricing)
+
+    contracts = float(straddle.contracts)
+    return [
+        _apply_hedge(idx, path, roll_trades, h, contracts, initial_cash)
+        for h in hedges
+    ]
 
-    return daily, trades
 
+def simulate_periodic_straddle(
+    df_spy: pd.DataFrame,
+    straddle: StraddleParams,
+    pricing: PricingParams,
+    hedge: HedgeParams,
+    initial_cash: float = 100000.0,
+    sigma_col: str = "sigma_proxy"
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Simula:
+    - Long straddle periódico (roll W/M)
+    - (Opcional) delta-hedge con subyacente (shares) usando tus griegas BS.
+
+    Inputs:
+    - df_spy: DataFrame con columnas: ['datetime','close'] mínimo.
+    - straddle: parámetros de roll y tamaño.
+    - pricing: parámetros de vol y BS.
+    - hedge: reglas de hedge.
+    - initial_cash: cash inicial.
+
+    Outputs:
+    - daily: MTM diario, greeks, hedge, equity
+    - trades: eventos de roll y hedge (simulados)
+    """
+    return simulate_periodic_straddle_multi(
+        df_spy, straddle, pricing, [hedge],
+        initial_cash=initial_cash,
+        sigma_col=sigma_col,
+    )[0]
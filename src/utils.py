@@ -1 +1,23 @@
+# src/utils.py
+# -*- coding: utf-8 -*-
 
+from __future__ import annotations
+
+import pandas as pd
+
+
+# fastmath de Numba sin "nnan"/"ninf" ni "afn": los kernels de pricing devuelven NaN
+# para inputs inválidos (igual que la versión Python) y esos NaN tienen que propagarse.
+NUMBA_FASTMATH = {"nsz", "arcp", "contract", "reassoc"}
+
+
+def naive_datetime(s: pd.Series) -> pd.Series:
+    """
+    Columna datetime64 sin zona horaria.
+    Si ya viene tipada (IBKR/Parquet) no se reparsea; solo se quita la tz si la tiene.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(s):
+        s = pd.to_datetime(s, cache=True)
+    if s.dt.tz is not None:
+        s = s.dt.tz_localize(None)
+    return s
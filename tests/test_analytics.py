@@ -0,0 +1,34 @@
+# tests/test_analytics.py
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from src.analytics import load_daily_csv
+
+
+@pytest.mark.parametrize("index_name", ["datetime", None])
+def test_load_daily_csv_roundtrip(tmp_path, index_name):
+    # index con nombre "datetime" y sin nombre ("Unnamed: 0" / "" según el parser)
+    idx = pd.to_datetime(["2020-01-03", "2020-01-01", "2020-01-02"]).rename(index_name)
+    daily = pd.DataFrame({"equity": [3.0, 1.0, 2.0], "cash": [30.0, 10.0, 20.0]}, index=idx)
+    path = tmp_path / "daily.csv"
+    daily.to_csv(path)
+
+    df = load_daily_csv(path)
+
+    assert df.index.name == "datetime"
+    assert pd.api.types.is_datetime64_any_dtype(df.index)
+    assert df.index.is_monotonic_increasing
+    assert list(df.columns) == ["equity", "cash"]
+    assert df["equity"].tolist() == [1.0, 2.0, 3.0]
+    assert (df.index == pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-03"])).all()
+
+
+def test_load_daily_csv_sin_columna_fecha(tmp_path):
+    path = tmp_path / "daily.csv"
+    pd.DataFrame({"equity": [1.0]}).to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        load_daily_csv(path)
@@ -0,0 +1,56 @@
+# tests/test_execution.py
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+
+from src.execution import ExecutionParams, simulate_legging_cost_batch, _apply_slippage
+from src.pricing import bs_price_vec
+
+
+def _raw_extra_costs(S, K, T, sigma, params, r, q, call_first):
+    # Costes extra simulados sin atajos: todas las sims por fila, sin ordenar Z
+    rng = np.random.default_rng(params.seed)
+    Z = rng.standard_normal(params.n_sims)
+    dt_years = params.leg_delay_seconds / params.seconds_in_year
+    leg_factor = _apply_slippage(1.0, params.slippage_bps_leg)
+
+    rows = []
+    for s, k, t, sig in zip(S, K, T, sigma):
+        one = np.ones(1)
+        call1 = bs_price_vec(s * one, k * one, t * one, r, sig * one, "C", q=q)[0]
+        put1 = bs_price_vec(s * one, k * one, t * one, r, sig * one, "P", q=q)[0]
+        combo = _apply_slippage(call1 + put1, params.slippage_bps_combo)
+        S2 = s + s * sig * math.sqrt(dt_years) * Z
+        n = S2.size
+        leg2 = bs_price_vec(S2, np.full(n, k), np.full(n, t), r, np.full(n, sig), "P" if call_first else "C", q=q)
+        leg1 = call1 if call_first else put1
+        rows.append((leg1 + leg2) * leg_factor - combo)
+    return np.array(rows)
+
+
+@pytest.mark.parametrize("order", ["C_then_P", "P_then_C"])
+def test_legging_batch_percentiles_match_np_percentile(order):
+    # ATM, OTM/ITM, vol muy alta, sigma=0 y S=0 (estos dos -> NaN en ambos lados)
+    S = np.array([450.0, 450.0, 450.0, 100.0, 450.0, 0.0])
+    K = np.array([450.0, 470.0, 430.0, 100.0, 450.0, 450.0])
+    T = np.array([30 / 365, 10 / 365, 60 / 365, 5 / 365, 30 / 365, 30 / 365])
+    sigma = np.array([0.15, 0.25, 0.10, 1.50, 0.0, 0.20])
+    params = ExecutionParams(n_sims=2001, seed=7, leg_delay_seconds=600.0)
+    r, q = 0.03, 0.01
+
+    out = simulate_legging_cost_batch(S=S, K=K, T=T, sigma=sigma, params=params, r=r, q=q, order=order)
+    extra = _raw_extra_costs(S, K, T, sigma, params, r, q, order == "C_then_P")
+
+    with np.errstate(invalid="ignore"):
+        ref = np.percentile(extra, [50, 90, 99], axis=1).T
+    got = np.column_stack([out["legging_extra_p50"], out["legging_extra_p90"], out["legging_extra_p99"]])
+
+    np.testing.assert_allclose(got, ref, rtol=1e-9, atol=1e-12, equal_nan=True)
+    np.testing.assert_allclose(out["legging_extra_mean"], extra.mean(axis=1), rtol=1e-9, atol=1e-12, equal_nan=True)
+    assert np.isnan(got[4]).all() and np.isnan(got[5]).all()
+    assert np.isfinite(got[:4]).all()